@@ -0,0 +1,111 @@
+"""Append-only archive of completed tasks.
+
+With settings.archive_completed, saving moves completed tasks out of the
+data file into segment files in a directory next to it, so the data file
+only ever holds active tasks and loading it costs the same however much
+history piles up. Each segment holds up to settings.archive_segment_size
+tasks, one JSON record per line with the date it was archived added, and
+only the last one is ever appended to. Compacting the archive drops tasks
+that have been archived for longer than a retention period and packs the
+rest into full segments.
+"""
+import datetime
+import json
+import os
+
+import fsutil
+import settings
+
+
+def archive_dir(path):
+    return f'{path}.archive'
+
+
+def _segment_path(path, number):
+    return os.path.join(archive_dir(path), f'segment-{number:06d}.jsonl')
+
+
+def segments(path):
+    """Return the segment files of the archive for path, oldest first."""
+    try:
+        names = os.listdir(archive_dir(path))
+    except FileNotFoundError:
+        return []
+
+    return [os.path.join(archive_dir(path), name) for name in sorted(names)
+            if name.startswith('segment-') and name.endswith('.jsonl')]
+
+
+def _number(segment):
+    return int(os.path.basename(segment)[len('segment-'):-len('.jsonl')])
+
+
+def append(path, records, today):
+    """Archive records (task records as stored in the data file) as of
+    today. Must be called with the data file locked."""
+    if not records:
+        return
+
+    os.makedirs(archive_dir(path), exist_ok=True)
+    existing = segments(path)
+    archived = today.isoformat()
+
+    if existing:
+        number = _number(existing[-1])
+        with open(existing[-1], 'r') as f:
+            count = sum(1 for _ in f)
+    else:
+        number, count = 0, 0
+
+    while records:
+        if count >= settings.archive_segment_size:
+            number, count = number + 1, 0
+
+        batch = records[:settings.archive_segment_size - count]
+        records = records[len(batch):]
+
+        with open(_segment_path(path, number), 'a') as f:
+            f.write(''.join(json.dumps(dict(r, archived=archived)) + '\n'
+                            for r in batch))
+        count += len(batch)
+
+
+def records(path):
+    """Generate the archived records for path, oldest first."""
+    for segment in segments(path):
+        with open(segment, 'r') as f:
+            for line in f:
+                if line.strip() != '':
+                    yield json.loads(line)
+
+
+def compact(path, today, retention_days=None):
+    """Drop the tasks archived more than retention_days before today (none
+    if it is None) and rewrite the rest into as few segments as possible,
+    returning how many were dropped."""
+    with fsutil.locked(path):
+        old = segments(path)
+        if not old:
+            return 0
+
+        kept = list(records(path))
+        total = len(kept)
+
+        if retention_days is not None:
+            cutoff = today - datetime.timedelta(days=retention_days)
+            cutoff = cutoff.isoformat()
+            kept = [r for r in kept if r.get('archived', '') >= cutoff]
+
+        # write the new segments before removing the old ones, so a crash
+        # leaves tasks archived twice rather than not at all
+        size = settings.archive_segment_size
+        number = _number(old[-1]) + 1
+        for start in range(0, len(kept), size):
+            lines = [json.dumps(r) + '\n' for r in kept[start:start + size]]
+            fsutil.atomic_write(_segment_path(path, number), ''.join(lines))
+            number += 1
+
+        for segment in old:
+            os.remove(segment)
+
+        return total - len(kept)
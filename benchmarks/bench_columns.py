@@ -0,0 +1,95 @@
+"""Compare filtering `list` and `status` over Task objects with the columnar
+TaskColumns view (with and without NumPy).
+
+Usage: python benchmarks/bench_columns.py [count ...]
+"""
+import datetime
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+import columns  # noqa: E402
+import models  # noqa: E402
+
+import generate  # noqa: E402
+
+
+def make_tasks(count):
+    tasks = []
+
+    for data in generate.generate_tasks(count):
+        if 'due' in data:
+            data['due'] = datetime.date.fromisoformat(data['due'])
+        tasks.append(models.Task(**data))
+
+    return tasks
+
+
+def objects_list(tasks, limit):
+    # the filters `list` used to run over Task objects
+    selected = filter(lambda t: not t.recurs or t.recurs and t.due < limit,
+                      tasks)
+    selected = filter(lambda t: t.completed is False, selected)
+
+    def _date_sort(t):
+        return datetime.date.max if t.due is None else t.due
+
+    return sorted(selected, key=_date_sort, reverse=True)
+
+
+def objects_status(tasks, today):
+    return sorted(filter(lambda t: t.due and not t.completed
+                         and t.due <= today, tasks), key=lambda t: t.id)
+
+
+def best(fn, runs=3):
+    times = []
+
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+
+def main(counts):
+    today = datetime.date.today()
+    limit = today + datetime.timedelta(days=180)
+    numpy = columns.load_numpy(columns.NUMPY_ROWS)
+
+    for count in counts:
+        tasks = make_tasks(count)
+        print(f'{count} tasks')
+
+        print(f'  {"objects list":<24}'
+              f'{best(lambda: objects_list(tasks, limit)) * 1000:10.1f} ms')
+        print(f'  {"objects status":<24}'
+              f'{best(lambda: objects_status(tasks, today)) * 1000:10.1f} ms')
+
+        for name, module in [('array', None), ('numpy', numpy)]:
+            if name == 'numpy' and numpy is None:
+                continue
+
+            columns.numpy = module
+            cols = None
+
+            def build():
+                nonlocal cols
+                cols = columns.TaskColumns(tasks)
+
+            print(f'  {name + " build":<24}{best(build) * 1000:10.1f} ms')
+            print(f'  {name + " list":<24}'
+                  f'{best(lambda: cols.select(False, limit)) * 1000:10.1f} ms')
+            print(f'  {name + " status":<24}'
+                  f'{best(lambda: cols.overdue(today)) * 1000:10.1f} ms')
+
+        columns.numpy = numpy
+        del tasks
+
+
+if __name__ == '__main__':
+    main([int(a) for a in sys.argv[1:]] or [100000, 1000000])
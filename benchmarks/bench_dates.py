@@ -0,0 +1,79 @@
+"""Measure load and save throughput (tasks per second) and how much of it
+goes on due dates: decoding them with the natural-language parser used for
+user input against the cached storage path, and encoding them with strftime
+against the cached one.
+
+Usage: python benchmarks/bench_dates.py [count ...]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+import models  # noqa: E402
+import scheduling  # noqa: E402
+import settings  # noqa: E402
+
+import generate  # noqa: E402
+
+
+def best(fn, runs=3):
+    times = []
+
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+
+def report(name, count, seconds):
+    print(f'  {name:<24}{seconds * 1000:10.1f} ms'
+          f'{count / seconds / 1000:10.0f}k tasks/s')
+
+
+def main(counts):
+    for count in counts:
+        records = list(generate.generate_tasks(count))
+        dues = [r['due'] for r in records if 'due' in r]
+        print(f'{count} tasks, {len(dues)} due dates')
+
+        report('parse_due_date', count, best(
+            lambda: [scheduling.parse_due_date(d) for d in dues]))
+        report('storage decode', count, best(
+            lambda: [models._stored_ordinal(d, settings.date_format)
+                     for d in dues]))
+
+        dates = [models._date(models._stored_ordinal(d, settings.date_format))
+                 for d in dues]
+        report('strftime', count, best(
+            lambda: [d.strftime(settings.date_format) for d in dates]))
+        report('storage encode', count, best(
+            lambda: [models._stored_date(d.toordinal(), settings.date_format)
+                     for d in dates]))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'tasks.json')
+            with open(path, 'w') as f:
+                json.dump(records, f)
+
+            collection = None
+
+            def load():
+                nonlocal collection
+                collection = models.TaskCollection()
+                collection.load(path)
+
+            report('load', count, best(load))
+            report('save', count, best(lambda: collection._write(path)))
+
+        del records, dues, dates, collection
+
+
+if __name__ == '__main__':
+    main([int(a) for a in sys.argv[1:]] or [100000, 1000000])
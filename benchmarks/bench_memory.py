@@ -0,0 +1,77 @@
+"""Report memory used per task for large collections.
+
+"before" is the old Task model (a plain object with a __dict__, a date
+object per task and a schedule string per task), kept here for comparison.
+
+Usage: python benchmarks/bench_memory.py [count ...]
+"""
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+import models  # noqa: E402
+import scheduling  # noqa: E402
+
+import generate  # noqa: E402
+
+
+class LegacyTask:
+    def __init__(self, **kwargs):
+        self.id = None
+        self.name = ''
+        self._due = None
+        self.schedule = None
+        self.completed = False
+        self.recurs = False
+
+        for k, v in kwargs.items():
+            setattr(self, k, v)
+
+    @property
+    def due(self):
+        return self._due
+
+    @due.setter
+    def due(self, d):
+        self._due = scheduling.parse_due_date(d)
+
+
+def measure(records, build):
+    gc.collect()
+    start = time.perf_counter()
+    tasks = build(records)
+    elapsed = time.perf_counter() - start
+    del tasks
+
+    # time and memory are measured separately, as tracing slows things down
+    gc.collect()
+    tracemalloc.start()
+    tasks = build(records)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del tasks
+    return size, elapsed
+
+
+def main(counts):
+    for count in counts:
+        # reparse so every record has its own strings, as after json.load
+        records = json.loads(json.dumps(generate.generate_tasks(count)))
+        print(f'{count} tasks')
+
+        for name, build in [
+                ('before', lambda r: [LegacyTask(**d) for d in r]),
+                ('after', lambda r: [models.Task.from_record(d) for d in r])]:
+            size, elapsed = measure(records, build)
+            print(f'  {name:<8}{size / count:8.1f} bytes/task'
+                  f'{elapsed * 1000:10.1f} ms')
+
+
+if __name__ == '__main__':
+    main([int(a) for a in sys.argv[1:]] or [100000, 1000000])
@@ -0,0 +1,57 @@
+"""Time start-to-exit of task commands against a large data file.
+
+Commands that need no task data (--help and the completion helpers) should
+take the same time regardless of how many tasks there are.
+
+Usage: python benchmarks/bench_startup.py [count] [runs]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import generate
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COMMANDS = [
+    ('tasks.py', '--help'),
+    ('completion.py', 'list_commands'),
+    ('completion.py', 'list_options', 'add'),
+    ('tasks.py', 'status'),
+    ('completion.py', 'dmenu'),
+    ('fast.py', 'list_commands'),
+    ('fast.py', 'status'),
+    ('fast.py', 'dmenu'),
+]
+
+
+def time_command(args, env, runs):
+    best = None
+
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, env=env, check=True,
+                       stdout=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+
+def main(count=100000, runs=5):
+    with tempfile.TemporaryDirectory() as tmp:
+        generate.write_tasks(count, os.path.join(tmp, 'tasks.json'))
+        env = dict(os.environ, XDG_DATA_HOME=tmp)
+
+        print(f'{count} tasks, best of {runs} runs')
+        for cmd in COMMANDS:
+            args = [os.path.join(ROOT, cmd[0])] + list(cmd[1:])
+            elapsed = time_command(args, env, runs)
+            print(f'{" ".join(cmd):<35} {elapsed * 1000:8.1f} ms')
+
+
+if __name__ == '__main__':
+    main(*(int(a) for a in sys.argv[1:]))
@@ -0,0 +1,207 @@
+"""Time the main task operations against synthetic data files of several
+sizes and write the results as JSON, so runs on different commits can be
+compared.
+
+Usage: python benchmarks/bench_suite.py [options] [-o results.json]
+       python benchmarks/bench_suite.py --compare old.json new.json
+
+Run with --help for the generator options (see generate.py).
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+import caches  # noqa: E402
+import columns  # noqa: E402
+import models  # noqa: E402
+import storage  # noqa: E402
+
+import generate  # noqa: E402
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SIZES = [1000, 10000, 100000, 1000000]
+
+# lookups, id allocations and completions are timed this many at a time and
+# reported per call
+CALLS = 1000
+
+
+def best(fn, runs, setup=None):
+    """Return the fastest of runs calls of fn, in seconds. setup is called
+    (untimed) before each of them."""
+    times = []
+
+    for _ in range(runs):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+
+def duration(seconds):
+    if seconds < 0.001:
+        return f'{seconds * 1e6:10.2f} us'
+    return f'{seconds * 1000:10.2f} ms'
+
+
+def commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                              cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_size(size, runs, backend, options, tmp):
+    path = os.path.join(tmp, f'tasks-{size}.json')
+    generate.write_tasks(size, path, **options)
+
+    rng = random.Random(size)
+    today = datetime.date.today()
+    limit = today + datetime.timedelta(days=180)
+    results = {}
+
+    def load():
+        return storage.open_collection(path, backend)
+
+    results['load'] = best(load, runs)
+
+    collection = load()
+    results['save'] = best(lambda: collection.save(path), runs)
+
+    ids = [rng.randrange(size) for _ in range(CALLS)]
+    results['find_by_id'] = best(
+        lambda: [collection.find_by_id(id) for id in ids], runs) / CALLS
+    results['find_unused_id'] = best(
+        lambda: [collection.find_unused_id() for _ in ids], runs) / CALLS
+
+    def cold():
+        # drop the views a fresh process would have to build first
+        collection._columns = None
+        collection._search_index = None
+        collection._due_index = None
+
+    selected = None
+
+    def list_tasks():
+        nonlocal selected
+        selected = collection.select(recurring_before=limit)
+
+    results['list'] = best(list_tasks, runs, cold)
+    results['list_warm'] = best(
+        lambda: collection.select(recurring_before=limit), runs)
+    results['list_search'] = best(
+        lambda: collection.select(recurring_before=limit,
+                                  search=['bills']), runs, cold)
+    results['list_search_warm'] = best(
+        lambda: collection.select(recurring_before=limit,
+                                  search=['bills']), runs)
+
+    results['status'] = best(
+        lambda: caches.status_line(collection.overdue(today)), runs, cold)
+    results['status_warm'] = best(
+        lambda: caches.status_line(collection.overdue(today)), runs)
+    files = storage.data_files(path, backend)
+    results['status_cached'] = best(
+        lambda: caches.read_status_cache(path, files, today), runs)
+
+    recurring = [t for t in collection if t.recurs]
+    if recurring:
+        sample = [rng.choice(recurring) for _ in range(CALLS)]
+        results['complete_recurring'] = best(
+            lambda: [t.complete() for t in sample], runs) / CALLS
+
+    results['display_output'] = best(
+        lambda: models.TaskListDisplay(selected).output(), runs)
+
+    os.remove(path)
+    return results
+
+
+def run(sizes, runs, backend, options):
+    report = {
+        'commit': commit(),
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': columns.load_numpy(columns.NUMPY_ROWS) is not None,
+        'backend': backend,
+        'runs': runs,
+        'generator': dict(options, schedules=list(options['schedules'])),
+        'results': {},
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            results = bench_size(size, runs, backend, options, tmp)
+            report['results'][str(size)] = results
+
+            print(f'{size} tasks', file=sys.stderr)
+            for name, seconds in results.items():
+                print(f'  {name:<22}{duration(seconds)}', file=sys.stderr)
+
+    return report
+
+
+def compare(old, new):
+    """Print the time each operation took in new relative to old."""
+    print(f'{old.get("commit")} -> {new.get("commit")}')
+
+    for size, results in new['results'].items():
+        print(f'{size} tasks')
+        for name, seconds in results.items():
+            before = old['results'].get(size, {}).get(name)
+            if before is None:
+                continue
+            print(f'  {name:<22}{duration(before)}{duration(seconds)}'
+                  f'{seconds / before:10.2f}x')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark task operations.')
+    parser.add_argument('--sizes', default=','.join(map(str, SIZES)),
+                        help='comma separated task counts '
+                        '(default %(default)s)')
+    parser.add_argument('--runs', type=int, default=3,
+                        help='report the best of this many runs (default 3)')
+    parser.add_argument('--backend', default='json',
+                        choices=sorted(storage.backends))
+    parser.add_argument('-o', '--output', help='write the results here')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+                        help='compare two result files instead')
+    generate.add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as old, open(args.compare[1]) as new:
+            compare(json.load(old), json.load(new))
+        return
+
+    sizes = [int(s) for s in args.sizes.split(',')]
+    report = run(sizes, args.runs, args.backend, generate.options(args))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
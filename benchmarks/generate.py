@@ -0,0 +1,99 @@
+"""Generate synthetic task data files for benchmarking.
+
+Usage: python benchmarks/generate.py [options] <count> <path>
+"""
+import argparse
+import datetime
+import json
+import random
+
+
+WORDS = ['call', 'email', 'buy', 'fix', 'review', 'write', 'plan', 'clean',
+         'pay', 'book', 'renew', 'water', 'the', 'report', 'bills', 'plants',
+         'car', 'dentist', 'groceries', 'taxes', 'garage', 'meeting', 'notes',
+         'backup', 'laptop', 'library', 'invoice', 'slides', 'budget', 'mom']
+
+SCHEDULES = ['1 day', '3 days', '1 week', '2 weeks', '1 month', '3 months',
+             '1 year', 'weekdays', 'monday', 'monday,thursday', 'friday']
+
+
+def generate_tasks(count, seed=0, completed=0.3, dated=0.7, recurring=0.3,
+                   name_words=(2, 6), schedules=SCHEDULES):
+    """Return a list of count task records as they are stored on disk.
+
+    completed and dated are the share of tasks that are completed and that
+    have a due date, recurring the share of tasks with a due date that
+    recur (recurring tasks are never completed). Names are name_words[0] to
+    name_words[1] words long, and schedules are picked from schedules (list
+    one several times to make it more common).
+    """
+    rng = random.Random(seed)
+    today = datetime.date.today()
+    tasks = []
+
+    for id in range(count):
+        task = {
+            'id': id,
+            'name': ' '.join(rng.choice(WORDS)
+                             for _ in range(rng.randint(*name_words))),
+            'recurs': False,
+            'completed': rng.random() < completed,
+        }
+
+        if rng.random() < dated:
+            due = today + datetime.timedelta(days=rng.randint(-60, 400))
+            task['due'] = due.strftime('%Y-%m-%d')
+
+            if rng.random() < recurring:
+                task['recurs'] = True
+                task['completed'] = False
+                task['schedule'] = rng.choice(schedules)
+
+        tasks.append(task)
+
+    return tasks
+
+
+def write_tasks(count, path, seed=0, **options):
+    with open(path, 'w') as f:
+        json.dump(generate_tasks(count, seed, **options), f)
+
+
+def add_arguments(parser):
+    """Add options for the generate_tasks parameters to an argparse
+    parser; options(args) turns the parsed values back into keywords."""
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--completed', type=float, default=0.3,
+                        help='share of completed tasks (default 0.3)')
+    parser.add_argument('--dated', type=float, default=0.7,
+                        help='share of tasks with a due date (default 0.7)')
+    parser.add_argument('--recurring', type=float, default=0.3,
+                        help='share of dated tasks that recur (default 0.3)')
+    parser.add_argument('--name-words', default='2-6', metavar='MIN-MAX',
+                        help='words per task name (default 2-6)')
+    parser.add_argument('--schedule', action='append', dest='schedules',
+                        metavar='SCHEDULE',
+                        help='schedule to pick from, may be repeated '
+                        '(default: a mix of common ones)')
+
+
+def options(args):
+    low, _, high = args.name_words.partition('-')
+    return {
+        'seed': args.seed,
+        'completed': args.completed,
+        'dated': args.dated,
+        'recurring': args.recurring,
+        'name_words': (int(low), int(high or low)),
+        'schedules': args.schedules or SCHEDULES,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a tasks.json.')
+    parser.add_argument('count', type=int)
+    parser.add_argument('path')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    write_tasks(args.count, args.path, **options(args))
@@ -0,0 +1,114 @@
+"""Ready-to-print command output, written next to the data file on save.
+
+Each cache starts with one header line per file the tasks are stored in:
+
+    # <inode> <mtime> <size> <path>
+
+(or "# - - - <path>" if that file does not exist), with the mtime in seconds
+to the nanosecond, followed by the output of the matching command. A cache
+is only valid while every header still matches the file it names (the same
+fsutil.stamp saving goes by), which lets the shell scripts check it with
+`stat -c '%i %.9Y %s'` and print it without starting Python.
+
+The status cache additionally starts with the range of dates it holds for:
+the day it was written, and the first day after that on which a task falls
+due (or "-" if there is none).
+"""
+import os
+
+import fsutil
+
+
+def cache_path(path, kind):
+    return f'{path}.{kind}'
+
+
+def _header(files):
+    lines = []
+
+    for f, stamp in zip(files, fsutil.stamp(files)):
+        if stamp is None:
+            lines.append(f'# - - - {f}\n')
+        else:
+            ino, mtime_ns, size = stamp
+            mtime = f'{mtime_ns // 10**9}.{mtime_ns % 10**9:09d}'
+            lines.append(f'# {ino} {mtime} {size} {f}\n')
+
+    return ''.join(lines)
+
+
+def id_lines(collection):
+    return [f'{id}:{name}' for id, name in collection.names()]
+
+
+def dmenu_lines(collection):
+    return [f'[{t.display_id}] {t.name}'
+            for t in sorted([t for t in collection if not t.completed],
+                            key=lambda t: t.id)]
+
+
+def write_completion_caches(collection, path):
+    """Write the list_ids and dmenu caches for the tasks stored at path."""
+    header = _header(collection.files(path))
+
+    for kind, lines in [('ids', id_lines(collection)),
+                        ('dmenu', dmenu_lines(collection))]:
+        body = ''.join(f'{line}\n' for line in lines)
+        fsutil.atomic_write(cache_path(path, kind), header + body)
+
+
+def read_cache(path, kind, files):
+    """Return the lines of a cache, or None if it is missing or stale."""
+    try:
+        with open(cache_path(path, kind), 'r') as f:
+            contents = f.read()
+    except FileNotFoundError:
+        return None
+
+    lines = contents.splitlines()
+    header = [line for line in lines if line.startswith('# ')]
+
+    if header == [] or ''.join(f'{h}\n' for h in header) != _header(files):
+        return None
+
+    return lines[len(header):]
+
+
+def status_line(tasks):
+    return ' '.join(f'[{t.display_id}] {t.name}' for t in tasks)
+
+
+def write_status_cache(collection, path, today):
+    """Write the `status` output for today, returning it."""
+    line = status_line(collection.overdue(today))
+    until = collection.next_due(today)
+    until = '-' if until is None else until.isoformat()
+
+    header = _header(collection.files(path))
+    fsutil.atomic_write(cache_path(path, 'status'),
+                        f'{header}{today.isoformat()} {until}\n{line}\n')
+    return line
+
+
+def read_status_cache(path, files, today):
+    """Return the cached `status` output for today, or None if it has to be
+    worked out again."""
+    lines = read_cache(path, 'status', files)
+    if lines is None or len(lines) != 2:
+        return None
+
+    start, until = lines[0].split()
+    today = today.isoformat()
+
+    if today < start or (until != '-' and today >= until):
+        return None
+
+    return lines[1]
+
+
+def remove_caches(path):
+    for kind in ['ids', 'dmenu', 'status']:
+        try:
+            os.remove(cache_path(path, kind))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,122 @@
+"""Column-oriented view of a task list for fast filtering and sorting.
+
+The fields `list` and `status` filter on are copied into parallel arrays
+(ids, due dates as ordinals and a bit field of flags), which are filtered
+with NumPy masks when NumPy is installed and with plain comprehensions over
+the arrays otherwise. Either way no Task attributes are touched until the
+matching rows are picked out.
+
+NumPy takes longer to import than everything else a command needs put
+together, so it is only imported the first time there are enough rows for
+it to pay for itself (see load_numpy).
+"""
+import array
+import datetime
+
+
+# NumPy once load_numpy has imported it, or None if it is not installed
+_NOT_LOADED = object()
+numpy = _NOT_LOADED
+
+# below this many rows, plain Python is done before NumPy would be imported
+NUMPY_ROWS = 100000
+
+
+COMPLETED = 1
+RECURS = 2
+SCHEDULED = 4
+
+# sort key for tasks without a due date, which `list` shows first
+NO_DUE = datetime.date.max.toordinal() + 1
+
+
+def load_numpy(rows):
+    """Return the numpy module to work on rows rows with, or None to use
+    plain Python: if NumPy is not installed, or has not been imported yet
+    and there are too few rows to be worth it."""
+    global numpy
+
+    if numpy is _NOT_LOADED and rows >= NUMPY_ROWS:
+        try:
+            import numpy as module
+        except ImportError:
+            module = None
+        numpy = module
+
+    return None if numpy is _NOT_LOADED else numpy
+
+
+class TaskColumns:
+    def __init__(self, tasks):
+        self.tasks = tasks = list(tasks)
+        self.ids = array.array('q', [-1 if t.id is None else t.id
+                                     for t in tasks])
+        self.due = array.array('q', [NO_DUE if t.due_ordinal is None
+                                     else t.due_ordinal for t in tasks])
+        self.flags = array.array('B', [
+            (COMPLETED if t.completed else 0) | (RECURS if t.recurs else 0) |
+            (SCHEDULED if t.schedule is not None else 0) for t in tasks])
+
+        # whichever is picked here is used for every query
+        self._numpy = numpy = load_numpy(len(tasks))
+        if numpy is not None:
+            self._ids = numpy.frombuffer(self.ids, dtype=numpy.int64)
+            self._due = numpy.frombuffer(self.due, dtype=numpy.int64)
+            self._flags = numpy.frombuffer(self.flags, dtype=numpy.uint8)
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def _rows(self, indices):
+        return [self.tasks[i] for i in indices]
+
+    def overdue(self, date):
+        """Return incomplete tasks due on or before date, ordered by id."""
+        day = date.toordinal()
+
+        numpy = self._numpy
+        if numpy is not None:
+            mask = (self._due <= day) & (self._flags & COMPLETED == 0)
+            rows = numpy.flatnonzero(mask)
+            rows = rows[numpy.argsort(self._ids[rows], kind='stable')]
+            return self._rows(rows.tolist())
+
+        due, flags = self.due, self.flags
+        rows = [i for i in range(len(due))
+                if due[i] <= day and not flags[i] & COMPLETED]
+        rows.sort(key=self.ids.__getitem__)
+        return self._rows(rows)
+
+    def select(self, completed=False, recurring_before=None,
+               no_recurring=False):
+        """Return the tasks matching the `list` filters, latest due date
+        first (see TaskCollection.select)."""
+        completed = COMPLETED if completed else 0
+        before = None if recurring_before is None \
+            else recurring_before.toordinal()
+
+        numpy = self._numpy
+        if numpy is not None:
+            mask = self._flags & COMPLETED == completed
+            if before is not None:
+                mask &= (self._flags & RECURS == 0) | (self._due < before)
+            if no_recurring:
+                mask &= self._flags & SCHEDULED == 0
+
+            rows = numpy.flatnonzero(mask)
+            # a stable ascending sort on the negated key keeps rows with the
+            # same due date in their original order, like sorted(reverse=True)
+            rows = rows[numpy.argsort(-self._due[rows], kind='stable')]
+            return self._rows(rows.tolist())
+
+        due, flags = self.due, self.flags
+        rows = [i for i in range(len(flags))
+                if flags[i] & COMPLETED == completed]
+        if before is not None:
+            rows = [i for i in rows
+                    if not flags[i] & RECURS or due[i] < before]
+        if no_recurring:
+            rows = [i for i in rows if not flags[i] & SCHEDULED]
+
+        rows.sort(key=due.__getitem__, reverse=True)
+        return self._rows(rows)
@@ -1,67 +1,204 @@
 import calendar
+import os
+import signal
+import socket
+import socketserver
+import sys
+
 import click
+
+import caches
+import fast
+import models
+import settings
+import storage
 import tasks
 
 
+def command_lines():
+    # first line of the help only, longer help would break the completion
+    return [f'{c.name}:{c.help.splitlines()[0]}'
+            for c in tasks.cli.commands.values()]
+
+
+def id_lines(collection, cmd, args):
+    if cmd not in tasks.cli.commands:
+        return []
+
+    if cmd not in fast.ID_COMMANDS:
+        return []
+
+    lines = _task_lines('ids', collection)
+    return [line for line in lines if line.split(':', 1)[0] not in args]
+
+
+def option_lines(cmd, args):
+    if cmd not in tasks.cli.commands:
+        return []
+
+    if cmd == 'postpone':
+        opts = [d.lower() for d in calendar.day_name]
+        opts.extend(['today', 'tomorrow'])
+        return opts
+
+    c = tasks.cli.commands[cmd]
+    lines = []
+
+    for opt in [a for a in c.params if type(a) == click.core.Option]:
+        help = opt.help.replace('[', '\[').replace(']', '\]') \
+            .replace(':', '\:')
+        lines.append(f'{opt.opts[0]}:{help}')
+
+    return lines
+
+
+def dmenu_lines(collection):
+    return _task_lines('dmenu', collection)
+
+
+def _task_lines(kind, collection):
+    # without a collection, use the cache written on save if it is current
+    if collection is None:
+        files = storage.data_files(settings.data_file)
+        lines = caches.read_cache(settings.data_file, kind, files)
+        if lines is not None:
+            return lines
+
+        collection = tasks.tasks
+
+    generate = {'ids': caches.id_lines, 'dmenu': caches.dmenu_lines}[kind]
+    return generate(collection)
+
+
 @click.group()
 def completion():
     pass
 
 
-@completion.command()
+@completion.command(name='list_commands')
 def list_commands():
-    for c in tasks.cli.commands.values():
-        click.echo(f'{c.name}:{c.help}')
+    for line in command_lines():
+        click.echo(line)
 
 
-@completion.command()
+@completion.command(name='list_ids')
 @click.argument('cmd')
 @click.argument('args', nargs=-1)
 def list_ids(cmd, args):
-    if cmd not in tasks.cli.commands:
-        return
+    for line in id_lines(None, cmd, args):
+        click.echo(line)
 
-    if cmd not in ['delete', 'complete', 'postpone', 'reschedule']:
-        return
 
-    for t in tasks.tasks:
-        if t.display_id not in args:
-            click.echo(f'{t.display_id}:{t.name}')
-
-
-@completion.command()
+@completion.command(name='list_options')
 @click.argument('cmd')
 @click.argument('args', nargs=-1)
 def list_options(cmd, args):
-    if cmd not in tasks.cli.commands:
-        return
+    for line in option_lines(cmd, args):
+        click.echo(line)
 
-    if cmd == 'postpone':
-        opts = [d.lower() for d in calendar.day_name]
-        opts.extend(['today', 'tomorrow'])
 
-        for opt in opts:
-            click.echo(opt)
+@completion.command()
+def dmenu():
+    for line in dmenu_lines(None):
+        click.echo(line)
+
+
+class CompletionServer(socketserver.UnixStreamServer):
+    """Answers completion requests from a collection kept in memory.
+
+    A request is a single line holding the completion command and its
+    arguments separated by tabs, e.g. "list_ids<TAB>complete<TAB>1a". The
+    response is the same output the command would print, after which the
+    connection is closed. The collection is reloaded whenever its files
+    change.
+    """
+
+    def __init__(self, path, data_file):
+        self.data_file = data_file
+        self._collection = None
+        self._stamp = None
+        super().__init__(path, CompletionHandler)
+        os.chmod(path, 0o600)
+
+    @property
+    def collection(self):
+        stamp = storage.data_stamp(self.data_file)
+
+        if self._collection is None or stamp != self._stamp:
+            self._collection = storage.open_collection(
+                self.data_file, keep=models.incomplete)
+            self._stamp = stamp
+
+        return self._collection
+
+    def respond(self, cmd, args):
+        if cmd == 'list_commands':
+            return command_lines()
+
+        if cmd == 'list_options' and len(args) > 0:
+            return option_lines(args[0], args[1:])
+
+        if cmd == 'list_ids' and len(args) > 0:
+            return id_lines(self.collection, args[0], args[1:])
+
+        if cmd == 'dmenu':
+            return dmenu_lines(self.collection)
 
-    else:
-        c = tasks.cli.commands[cmd]
-        opts = [a for a in c.params if type(a) == click.core.Option]
+        return []
 
-        for opt in opts:
-            help = opt.help.replace('[', '\[').replace(']', '\]') \
-                .replace(':', '\:')
-            click.echo(f'{opt.opts[0]}:{help}')
+
+class CompletionHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        request = self.rfile.readline().decode().rstrip('\n')
+        if request == '':
+            return
+
+        cmd, *args = request.split('\t')
+
+        try:
+            lines = self.server.respond(cmd, args)
+        except Exception:
+            lines = []
+
+        self.wfile.write(''.join(f'{line}\n' for line in lines).encode())
+
+
+def _socket_in_use(path):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        try:
+            s.connect(path)
+        except OSError:
+            return False
+
+    return True
 
 
 @completion.command()
-def dmenu():
-    for t in sorted([t for t in tasks.tasks if not t.completed],
-                    key=lambda t: t.id):
-        click.echo(f'[{t.display_id}] {t.name}')
+def serve():
+    """Answer completion requests on settings.completion_socket."""
+    path = settings.completion_socket
 
+    if os.path.exists(path):
+        if _socket_in_use(path):
+            raise click.ClickException(f'{path} is already being served.')
+        os.remove(path)
 
-if __name__ == '__main__':
+    # make sure the socket is cleaned up when we are killed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    with CompletionServer(path, settings.data_file) as server:
+        try:
+            server.serve_forever()
+        finally:
+            os.remove(path)
+
+
+def main(args=None):
     try:
-        completion()
+        completion(args)
     except:
         pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""Incomplete tasks kept in due date order, for range queries.
+
+`status` wants the tasks due on or before today and `list` wants every task
+that does not recur plus the recurring ones due before the end of its
+window, latest first. DueIndex keeps incomplete tasks in two sorted lists,
+recurring and the rest, so both are answered with bisected slices that are
+already in order rather than a scan and a sort of every task. The lists are
+built from the columns of a TaskColumns (sorted with NumPy if it is
+installed) and then kept up to date one task at a time.
+"""
+import bisect
+
+import columns
+
+
+# tasks are sorted on due * _SPAN + _SPAN - 1 - order, where order is the
+# order they were added in: read backwards, latest due date first, tasks due
+# on the same day come out in the order they were added, like a stable sort
+# would leave them
+_SPAN = 1 << 40
+
+
+class DueIndex:
+    def __init__(self, cols):
+        tasks = cols.tasks
+        # the order of every task, which stays the same when it changes;
+        # only needed once tasks change, so only worked out then
+        self._tasks = tasks
+        self._order = None
+        self._count = len(tasks)
+        # tasks that have been taken out of the lists while they change,
+        # to be put back by flush
+        self._pending = {}
+
+        # [keys, tasks] for tasks that recur and for the rest
+        self._recurring = [[], []]
+        self._other = [[], []]
+
+        numpy = cols._numpy
+        for part, recurs in ((self._recurring, columns.RECURS),
+                             (self._other, 0)):
+            if numpy is not None:
+                mask = cols._flags & (columns.COMPLETED | columns.RECURS) \
+                    == recurs
+                rows = numpy.flatnonzero(mask)
+                keys = cols._due[rows] * _SPAN + (_SPAN - 1 - rows)
+                ordered = numpy.argsort(keys, kind='stable')
+                part[0] = keys[ordered].tolist()
+                rows = rows[ordered].tolist()
+            else:
+                due, flags = cols.due, cols.flags
+                rows = [i for i in range(len(tasks)) if flags[i] &
+                        (columns.COMPLETED | columns.RECURS) == recurs]
+                keys = {i: due[i] * _SPAN + _SPAN - 1 - i for i in rows}
+                rows.sort(key=keys.__getitem__)
+                part[0] = [keys[i] for i in rows]
+
+            part[1] = [tasks[i] for i in rows]
+
+    def __len__(self):
+        return len(self._recurring[0]) + len(self._other[0])
+
+    def _orders(self):
+        if self._order is None:
+            self._order = {id(t): i for i, t in enumerate(self._tasks)}
+            self._tasks = None
+
+        return self._order
+
+    def _key(self, task):
+        due = task.due_ordinal
+        if due is None:
+            due = columns.NO_DUE
+        return due * _SPAN + _SPAN - 1 - self._orders()[id(task)]
+
+    def _insert(self, task):
+        if task.completed:
+            return
+
+        keys, tasks = self._recurring if task.recurs else self._other
+        key = self._key(task)
+        i = bisect.bisect_left(keys, key)
+        keys.insert(i, key)
+        tasks.insert(i, task)
+
+    def _delete(self, task):
+        # the task must not have changed since it was inserted
+        if task.completed:
+            return
+
+        keys, tasks = self._recurring if task.recurs else self._other
+        i = bisect.bisect_left(keys, self._key(task))
+        del keys[i]
+        del tasks[i]
+
+    def add(self, task):
+        self._orders()[id(task)] = self._count
+        self._count += 1
+        self._insert(task)
+
+    def remove(self, task):
+        if self._pending.pop(id(task), None) is None:
+            self._delete(task)
+        del self._orders()[id(task)]
+
+    def detach(self, task):
+        """Take task out until the next flush, before it changes."""
+        if id(task) not in self._pending:
+            self._delete(task)
+            self._pending[id(task)] = task
+
+    def flush(self):
+        """Put back the tasks detached since the last flush, where they
+        belong now."""
+        for task in self._pending.values():
+            self._insert(task)
+
+        self._pending = {}
+
+    def due_by(self, day):
+        """Return the tasks due on or before the ordinal day, those that do
+        not recur first, each in due date order."""
+        end = (day + 1) * _SPAN
+        return [t for keys, tasks in (self._other, self._recurring)
+                for t in tasks[:bisect.bisect_left(keys, end)]]
+
+    def next_due(self, day):
+        """Return the earliest due date (as an ordinal) after the ordinal
+        day, or None."""
+        start = (day + 1) * _SPAN
+        dues = []
+
+        for keys, _ in (self._other, self._recurring):
+            i = bisect.bisect_left(keys, start)
+            if i < len(keys) and keys[i] // _SPAN != columns.NO_DUE:
+                dues.append(keys[i] // _SPAN)
+
+        return min(dues, default=None)
+
+    def select(self, recurring_before=None, no_recurring=False):
+        """Return the tasks matching the `list` filters, latest due date
+        first (see TaskCollection.select), with recurring_before as an
+        ordinal."""
+        end = len(self._recurring[0])
+        if recurring_before is not None:
+            end = bisect.bisect_left(self._recurring[0],
+                                     recurring_before * _SPAN)
+
+        keys = self._other[0] + self._recurring[0][:end]
+        tasks = self._other[1] + self._recurring[1][:end]
+
+        # two sorted runs, which sorting merges in linear time
+        rows = sorted(range(len(keys)), key=keys.__getitem__, reverse=True)
+        tasks = [tasks[i] for i in rows]
+
+        if no_recurring:
+            tasks = [t for t in tasks if t.schedule is None]
+
+        return tasks
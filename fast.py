@@ -0,0 +1,123 @@
+"""Entry point that answers the most frequently run commands quickly.
+
+`task status` and the completion helpers (`list_commands`, `list_ids` and
+`dmenu`) are run by status bars and shells over and over, and almost always
+just print a cache written on save. This module does that importing only
+settings and caches; anything else, or a cache that is stale, is handed to
+the click CLI in tasks.py or completion.py as usual.
+
+Usage: task <command> [args...]          (the installed `task` script)
+       python fast.py <command> [args...]
+
+where command is either a task command or a completion helper.
+"""
+import datetime
+import os
+import sys
+
+import caches
+import settings
+
+
+# the output of `completion.py list_commands`, which would need click and
+# all of tasks.py to work out (tests/test_fast.py keeps it up to date)
+COMMANDS = [
+    'add:Add a new task.',
+    'batch:Run several commands, loading and saving tasks once.',
+    'clean-cache:Remove all completed tasks.',
+    'complete:Mark a task completed.',
+    'delete:Delete a task.',
+    'list:List (or optionally search) tasks.',
+    'agenda:List what falls due over the next few weeks.',
+    'postpone:Change the due date of a task.',
+    'reschedule:Change the recurrence schedule of a task.',
+    'rename:Change the name of a task.',
+    'reorder:Reset task ids.',
+    'status:Statusbar-friendly output of (over)due tasks.',
+]
+
+COMPLETION_COMMANDS = ['list_commands', 'list_ids', 'list_options', 'dmenu',
+                       'serve']
+
+# commands that take task ids, as completed by `list_ids`
+ID_COMMANDS = ['delete', 'complete', 'postpone', 'reschedule']
+
+
+def data_files(path, backend):
+    """Return the same files as storage.data_files, without importing the
+    storage backends."""
+    if backend == 'journal':
+        return [path, f'{path}.journal']
+    if backend == 'sqlite':
+        return [os.path.splitext(path)[0] + '.db']
+    if backend == 'records':
+        base = os.path.splitext(path)[0]
+        return [f'{base}.rec', f'{base}.heap']
+    return [path]
+
+
+def _cached(kind):
+    files = data_files(settings.data_file, settings.storage_backend)
+
+    if kind == 'status':
+        if not settings.status_cache:
+            return None
+
+        status = caches.read_status_cache(settings.data_file, files,
+                                          datetime.date.today())
+        if status is None:
+            return None
+        return [status] if status != '' else []
+
+    if not settings.completion_cache:
+        return None
+    return caches.read_cache(settings.data_file, kind, files)
+
+
+def answer(args):
+    """Return the lines to print for args, or None if the full CLI has to
+    run."""
+    if os.environ.get('PYTASKS_PROFILE'):
+        return None
+
+    if args == ['status']:
+        return _cached('status')
+
+    if args == ['list_commands']:
+        return COMMANDS
+
+    if args == ['dmenu']:
+        return _cached('dmenu')
+
+    if len(args) >= 2 and args[0] == 'list_ids':
+        if args[1] not in ID_COMMANDS:
+            return []
+
+        lines = _cached('ids')
+        if lines is None:
+            return None
+        return [line for line in lines
+                if line.split(':', 1)[0] not in args[2:]]
+
+    return None
+
+
+def main(args=None):
+    if args is None:
+        args = sys.argv[1:]
+
+    lines = answer(args)
+    if lines is not None:
+        sys.stdout.write(''.join(f'{line}\n' for line in lines))
+        return
+
+    if args and args[0] in COMPLETION_COMMANDS:
+        import completion
+        completion.main(args)
+    else:
+        import tasks
+        tasks.cli(args)
+
+
+if __name__ == '__main__':
+    main()
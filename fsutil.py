@@ -0,0 +1,150 @@
+import contextlib
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# modules only some functions need are imported in them, as caches.py uses
+# stamp on fast.py's path, which has to import as little as possible
+
+
+# the umask can only be read by setting it, which would let files other
+# threads create meanwhile get the wrong mode, so it is read once, here
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def atomic_write(path, data):
+    """Replace the contents of path with data (a string, or bytes) so that
+    readers see either the old or the new contents, never a partial write.
+
+    The file keeps the permissions it had, or gets the usual ones for a new
+    file if it did not exist yet."""
+    import tempfile
+
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=f'.{name}.', dir=directory)
+
+    try:
+        try:
+            mode = os.stat(path).st_mode & 0o7777
+        except FileNotFoundError:
+            mode = 0o666 & ~_UMASK
+        os.chmod(tmp, mode)
+
+        with os.fdopen(fd, 'wb' if type(data) is bytes else 'w') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def stamp(files):
+    """Return a value that changes whenever one of files is written,
+    replaced, created or removed."""
+    stamp = []
+
+    for f in files:
+        try:
+            st = os.stat(f)
+        except FileNotFoundError:
+            stamp.append(None)
+        else:
+            stamp.append((st.st_ino, st.st_mtime_ns, st.st_size))
+
+    return tuple(stamp)
+
+
+@contextlib.contextmanager
+def locked(path):
+    """Hold the lock that group_commit serializes writers of path with."""
+    if fcntl is None:
+        yield
+        return
+
+    with open(f'{path}.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+
+    return True
+
+
+def group_commit(path, request, commit):
+    """Run commit while holding an exclusive lock on path, letting whoever
+    holds the lock commit for the writers waiting on it.
+
+    A writer that finds the lock taken queues request() (a JSON-serializable
+    description of its changes) in a directory next to path and waits. The
+    next writer to get the lock calls commit with the list of queued
+    requests, which must write its own changes along with them and return
+    one JSON-serializable result per request. Each result is handed back to
+    the writer that queued the request, which then returns it without
+    committing anything itself, so a burst of writers costs one write.
+
+    Returns None if commit was called, otherwise the result of our request.
+    Without fcntl (i.e. not on Unix) there is no locking at all.
+    """
+    import glob
+    import json
+
+    if fcntl is None:
+        commit([])
+        return None
+
+    queue = f'{path}.pending'
+
+    with open(f'{path}.lock', 'a') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.makedirs(queue, exist_ok=True)
+            name = f'{time.time_ns():020d}-{os.getpid()}'
+            ticket = os.path.join(queue, name)
+            atomic_write(f'{ticket}.json', json.dumps(request()))
+
+            fcntl.flock(lock, fcntl.LOCK_EX)
+
+            try:
+                with open(f'{ticket}.done') as f:
+                    result = json.load(f)
+            except FileNotFoundError:
+                # nobody got to it first, so we commit it ourselves
+                os.remove(f'{ticket}.json')
+            else:
+                os.remove(f'{ticket}.done')
+                return result
+
+        # writers killed while waiting leave their tickets (or the results
+        # handed back to them) behind, which nobody would ever remove
+        tickets = []
+        for ticket in sorted(glob.glob(os.path.join(glob.escape(queue), '*'))):
+            if not _alive(int(ticket.rsplit('-', 1)[1].split('.')[0])):
+                os.remove(ticket)
+            elif ticket.endswith('.json'):
+                tickets.append(ticket)
+
+        requests = []
+        for ticket in tickets:
+            with open(ticket) as f:
+                requests.append(json.load(f))
+
+        results = commit(requests)
+
+        for ticket, result in zip(tickets, results):
+            atomic_write(ticket[:-len('.json')] + '.done', json.dumps(result))
+            os.remove(ticket)
+
+    return None
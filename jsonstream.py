@@ -0,0 +1,92 @@
+"""Incremental parsing of a JSON array, one element at a time.
+
+json.load has to hold the whole document and every value in it at once.
+iter_array reads the file a chunk at a time instead and hands out each
+element as it is parsed, along with its source text, so a caller can decide
+per element whether to keep the parsed value or just the text.
+"""
+import json
+import re
+
+
+_SPACES = ' \t\n\r'
+_WHITESPACE = re.compile(f'[{_SPACES}]*')
+_scan = json.JSONDecoder().scan_once
+
+
+def iter_array(f, chunk_size=1 << 16):
+    """Yield (value, text) for each element of the JSON array in the text
+    file f, where text is the element exactly as it appears in f."""
+    buf = ''
+    # buf[start:] is all that is still needed: the element being parsed
+    # onwards
+    start = pos = 0
+
+    def more():
+        nonlocal buf, start, pos
+        chunk = f.read(chunk_size)
+        if chunk == '':
+            return False
+
+        buf = buf[start:] + chunk
+        pos -= start
+        start = 0
+        return True
+
+    def peek():
+        # the next character that is not whitespace, or '' at the end
+        nonlocal pos
+        while True:
+            pos = _WHITESPACE.match(buf, pos).end()
+            if pos < len(buf):
+                return buf[pos]
+            if not more():
+                return ''
+
+    if peek() != '[':
+        raise json.JSONDecodeError('Expecting an array', buf, pos)
+    pos += 1
+
+    if peek() == ']':
+        return
+
+    while True:
+        # records are usually separated by ", ", so most of the time there
+        # is no whitespace left to skip here
+        if pos == len(buf) or buf[pos] in _SPACES:
+            if peek() == '':
+                raise json.JSONDecodeError('Expecting value', buf, pos)
+
+        start = pos
+        try:
+            value, end = _scan(buf, start)
+        except (StopIteration, json.JSONDecodeError):
+            # most likely the element continues in the next chunk
+            if not more():
+                raise json.JSONDecodeError('Expecting value', buf, pos)
+            continue
+
+        # peek may read more, which moves everything in buf
+        length = end - start
+        parsed = len(buf) - start
+        pos = end
+        c = buf[pos] if pos < len(buf) and buf[pos] == ',' else peek()
+
+        if c != ',' and c != ']':
+            # a number cut short by the end of a chunk (say "2." of "2.5")
+            # parses as far as it goes, so try again with more text
+            grown = len(buf) - start > parsed
+            pos = start
+            if grown or more():
+                continue
+            raise json.JSONDecodeError("Expecting ',' delimiter", buf,
+                                       start + length)
+
+        yield value, buf[start:start + length]
+        pos += 1
+        if buf.startswith(' ', pos):
+            pos += 1
+        start = pos
+
+        if c == ']':
+            return
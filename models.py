@@ -1,8 +1,22 @@
+import archive
+import caches
+import columns
 import datetime as dt
+import dueindex
+import fsutil
+import functools
+import heapq
+import io
 import json
+import jsonstream
+import os
+import profiling
 import scheduling
+import search
 import settings
+import snapshot
 import string
+import sys
 
 
 def base36(number):
@@ -20,20 +34,50 @@ def base36(number):
     return ''.join(rv)
 
 
+def incomplete(record):
+    """TaskCollection.load predicate that leaves out completed tasks."""
+    return not record.get('completed', False)
+
+
 class TaskJSONEncoder(json.JSONEncoder):
     def default(self, o):
         if hasattr(o, 'to_json') and callable(o.to_json):
             return o.to_json()
 
-        if type(o) in [dt.datetime, dt.date]:
+        if type(o) is dt.date:
+            return _stored_date(o.toordinal(), settings.date_format)
+
+        if type(o) is dt.datetime:
             return o.strftime(settings.date_format)
 
         return super().default(o)
 
 
+# changes to these move a task in TaskCollection.due_index
+_DUE_ATTRS = frozenset(['due', 'completed', 'recurs'])
+
+
 class TaskCollection:
     def __init__(self):
         self.items = []
+        self._index = {}
+        self._free_ids = []
+        self._next_id = 0
+        self._search_index = None
+        self._renamed = []
+        self._columns = None
+        self._due_index = None
+        # stamp of the data files when they were last read or written, to
+        # tell whether another process has changed them since
+        self._stamp = None
+        # records left out by load (id -> (name, text as stored)) and the
+        # predicate that left them out
+        self._skipped = {}
+        self._keep = None
+        # what has changed since checkpoint was called (see rollback), or
+        # None when nothing is being kept
+        self._undo = None
+        self._mark_clean()
 
     def __iter__(self):
         return iter(self.items)
@@ -46,71 +90,749 @@ class TaskCollection:
 
     def add(self, item):
         self.items.append(item)
+        item._collection = self
+        self._added[id(item)] = item
+
+        if self._undo is not None:
+            self._undo.append(('add', item, None))
+        self._columns = None
+
+        if item.id is not None:
+            self._index[item.id] = item
+
+        if self._search_index is not None:
+            self._search_index.add(item)
+
+        if self._due_index is not None:
+            self._due_index.add(item)
+
+    def _add_stored(self, tasks):
+        # add for tasks read from the data file, which are not changes and
+        # are too many to update the views with one at a time
+        init = object.__setattr__
+        for task in tasks:
+            init(task, '_collection', self)
+
+        self.items.extend(tasks)
+        self._index.update((t.id, t) for t in tasks if t.id is not None)
+        self._columns = None
+        self._search_index = None
+        self._due_index = None
 
     def remove(self, item):
-        idx = self.items.index(item)
-        return self.items.pop(idx)
+        return self.remove_many([item])[0]
+
+    def remove_many(self, items):
+        """Remove several tasks, going over the collection once however
+        many there are."""
+        removing = {id(t): t for t in items}
+        kept = []
+        removed = []
+        for idx, t in enumerate(self.items):
+            if id(t) in removing:
+                removed.append((idx, t))
+            else:
+                kept.append(t)
+        if len(removed) != len(removing):
+            raise ValueError('task not in collection')
+
+        self.items[:] = kept
+
+        # rolled back last first, so the earliest position is put back first
+        if self._undo is not None:
+            for idx, t in reversed(removed):
+                self._undo.append(('remove', t, idx))
+
+        for _, t in removed:
+            t._collection = None
+            self._forget(t)
+
+            if self._index.get(t.id) is t:
+                del self._index[t.id]
+                heapq.heappush(self._free_ids, t.id)
+
+        return [t for _, t in removed]
+
+    def remove_completed(self):
+        """Remove all completed tasks, returning how many were removed."""
+        self.load_skipped()
+        starting = len(self.items)
+
+        if self._undo is not None:
+            self._undo.append(('items', None, list(self.items)))
 
-    def save(self, path):
+        for task in self.items:
+            if task.completed:
+                task._collection = None
+                self._forget(task)
+
+        self.items = [t for t in self.items if not t.completed]
+        self._search_index = None
+        self._due_index = None
+        self._columns = None
+        self._rebuild_index()
+        return starting - len(self.items)
+
+    def reorder(self):
+        """Reset task ids to their position in the collection."""
+        self.load_skipped()
+        for i, task in enumerate(self.items):
+            task.id = i
+
+        self._reordered = True
+        self._rebuild_index()
+
+    def _rebuild_index(self):
+        self._index = {t.id: t for t in self.items if t.id is not None}
+        self._free_ids = []
+        self._next_id = 0
+
+    def _mark_clean(self):
+        # tasks added, changed (with the id they had when last saved and the
+        # names of the changed attributes) and removed (by that id) since the
+        # collection was last loaded or saved
+        self._added = {}
+        self._changed = {}
+        self._removed = []
+        self._reordered = False
+
+    def _changing(self, task, attr):
+        # called by Task before one of its stored attributes changes
+        if self._undo is not None:
+            self._undo.append(('set', task, (attr, getattr(task, attr))))
+
+        if attr == 'name':
+            if self._search_index is not None:
+                self._renamed.append(task)
+        else:
+            self._columns = None
+
+            if attr in _DUE_ATTRS and self._due_index is not None:
+                self._due_index.detach(task)
+
+        key = id(task)
+        if key in self._added:
+            return
+
+        if key not in self._changed:
+            self._changed[key] = (task, task.id, set())
+        self._changed[key][2].add(attr)
+
+    def checkpoint(self):
+        """Start keeping track of changes, so that rollback can undo the
+        ones made from here on."""
+        self._undo = []
+        self._undo_marks = (dict(self._added),
+                            {key: (task, id, set(attrs)) for key, (
+                                task, id, attrs) in self._changed.items()},
+                            list(self._removed), self._reordered)
+
+    def rollback(self):
+        """Undo the changes made since checkpoint was last called."""
+        undo, self._undo = self._undo, None
+
+        # the views are built again when next needed
+        self._columns = None
+        self._search_index = None
+        self._due_index = None
+        self._renamed = []
+
+        for action, task, value in reversed(undo):
+            if action == 'set':
+                setattr(task, *value)
+            elif action == 'add':
+                # by identity, as tasks compare equal by id
+                idx = next(i for i in range(len(self.items) - 1, -1, -1)
+                           if self.items[i] is task)
+                del self.items[idx]
+                task._collection = None
+            elif action == 'remove':
+                self.items.insert(value, task)
+                task._collection = self
+            else:
+                self.items = value
+                for t in value:
+                    t._collection = self
+
+        self._added, self._changed, self._removed, self._reordered = \
+            self._undo_marks
+        self._rebuild_index()
+
+    def _forget(self, task):
+        self._columns = None
+
+        if self._search_index is not None:
+            self._search_index.remove(task)
+
+        if self._due_index is not None:
+            self._due_index.remove(task)
+
+        key = id(task)
+        if self._added.pop(key, None) is not None:
+            return
+
+        if key in self._changed:
+            self._removed.append(self._changed.pop(key)[1])
+        elif task.id is not None:
+            self._removed.append(task.id)
+
+    def _after_save(self, path):
+        self._mark_clean()
+
+        if settings.completion_cache:
+            # tasks skipped by load are still known by id and name, which is
+            # all the completion caches need
+            if self.fully_loaded or self._skipped:
+                caches.write_completion_caches(self, path)
+            else:
+                caches.remove_caches(path)
+
+        if settings.status_cache:
+            caches.write_status_cache(self, path, dt.date.today())
+
+    @property
+    def fully_loaded(self):
+        """Whether every stored task is in memory."""
+        return not self._skipped
+
+    @property
+    def dirty(self):
+        return bool(self._added or self._changed or self._removed)
+
+    def assign_ids(self):
+        """Give every task without an id an unused one."""
         for task in self.items:
             if task.id is None:
                 task.id = self.find_unused_id()
 
-        with open(path, 'w') as f:
-            json.dump(self.items, f, cls=TaskJSONEncoder)
+    def _reindex(self, task, old_id):
+        # called by Task when the id of a task in this collection changes
+        if old_id is not None and self._index.get(old_id) is task:
+            del self._index[old_id]
+            heapq.heappush(self._free_ids, old_id)
+
+        if task.id is not None:
+            self._index[task.id] = task
 
-    def load(self, path):
-        with open(path, 'r') as f:
-            tasks = json.load(f)
+    @staticmethod
+    def exists(path):
+        return os.path.exists(path)
 
-        for data in tasks:
-            t = Task(**data)
-            self.add(t)
+    @staticmethod
+    def files(path):
+        """Return the files the collection stored at path lives in."""
+        return [path]
+
+    def save(self, path):
+        """Save the collection, merging in whatever other processes have
+        saved since it was loaded.
+
+        Saves are serialized with a lock, and changes queued by processes
+        waiting on the lock are written along with ours (see
+        fsutil.group_commit)."""
+        with profiling.phase('save'):
+            ids = fsutil.group_commit(
+                path, self.changes, lambda queued: self._commit(path, queued))
+
+        if ids is not None:
+            # another process saved our changes for us
+            self._saved_elsewhere(ids)
+
+    def _commit(self, path, queued):
+        if not queued and self._stamp == fsutil.stamp(self.files(path)):
+            # nobody else has written since we loaded, so write as is
+            self.assign_ids()
+            with profiling.phase('write'):
+                self._archive_completed(path)
+                self._write(path)
+            self._stamp = fsutil.stamp(self.files(path))
+            with profiling.phase('caches'):
+                self._after_save(path)
+            return []
+
+        # merge our changes and the queued ones into what is on disk now
+        with profiling.phase('merge'):
+            merged = type(self)()
+            if merged.exists(path):
+                merged.load(path, self._keep)
+
+            ids = merged.apply_changes(self.changes())
+            results = [merged.apply_changes(changes) for changes in queued]
+
+        with profiling.phase('write'):
+            merged._archive_completed(path)
+            merged._write(path)
+        with profiling.phase('caches'):
+            merged._after_save(path)
+
+        self._saved_elsewhere(ids)
+        return results
+
+    def _saved_elsewhere(self, ids):
+        # our changes were merged into the data files by another collection,
+        # so they are saved but we no longer match what is on disk
+        for task, id in zip(list(self._added.values()), ids):
+            task.id = id
+
+        self._stamp = None
+        self._mark_clean()
+
+    def _archive_completed(self, path):
+        # see archive.py
+        if not settings.archive_completed:
+            return
+
+        self.load_skipped()
+        completed = [t for t in self.items if t.completed]
+        if not completed:
+            return
+
+        records = json.loads(json.dumps(completed, cls=TaskJSONEncoder))
+        archive.append(path, records, dt.date.today())
+        self.remove_completed()
+
+    def _write(self, path):
+        data = json.dumps(self.items, cls=TaskJSONEncoder)
+
+        if self._skipped:
+            # records left out by load are written back as they were read
+            skipped = ', '.join(text for _, text in self._skipped.values())
+            data = f'{data[:-1]}, {skipped}]' if self.items \
+                else f'[{skipped}]'
+
+        fsutil.atomic_write(path, data)
+
+        if settings.snapshot_cache:
+            with profiling.phase('write snapshot'):
+                self._write_snapshot(path, data.encode())
+
+    def changes(self):
+        """Return the unsaved changes as a JSON-serializable dict, for
+        apply_changes."""
+        changed = []
+        for task, id, attrs in self._changed.values():
+            if self._reordered:
+                attrs = attrs - {'id'}
+            changed.append({'id': id,
+                            'fields': {a: getattr(task, a) for a in attrs}})
+
+        changes = {
+            'added': list(self._added.values()),
+            'changed': changed,
+            'removed': self._removed,
+            'reorder': self._reordered,
+        }
+        return json.loads(json.dumps(changes, cls=TaskJSONEncoder))
+
+    def apply_changes(self, changes):
+        """Apply changes made to another copy of the collection, returning
+        the ids the added tasks ended up with.
+
+        Changes are merged per attribute, so two copies changing different
+        attributes of a task both keep theirs. Changes to tasks that have
+        since been removed are dropped, and added tasks whose id has been
+        taken in the meantime get a new one."""
+        self.remove_many(t for t in map(self.find_by_id, changes['removed'])
+                         if t is not None)
+
+        for change in changes['changed']:
+            task = self.find_by_id(change['id'])
+            if task is None:
+                continue
+
+            for k, v in change['fields'].items():
+                setattr(task, k, v)
+
+        added = []
+        for record in changes['added']:
+            task = Task.from_record(record)
+            if task.id is not None and self.find_by_id(task.id) is not None:
+                task.id = None
+
+            self.add(task)
+            if task.id is None:
+                task.id = self.find_unused_id()
+            added.append(task)
+
+        if changes['reorder']:
+            self.reorder()
+
+        return [t.id for t in added]
+
+    def load(self, path, keep=None):
+        """Load the tasks stored at path.
+
+        If keep is given, the data file is parsed one record at a time and
+        only records for which keep(record) is true become tasks. The others
+        are saved back as they were, built into tasks when find_by_id asks
+        for them, and all built at once by load_skipped and by anything
+        that needs completed tasks (which assumes keep keeps every task
+        that is not completed, like `incomplete` does).
+        """
+        # stamp first, so a write that races with reading is noticed later
+        self._stamp = fsutil.stamp(self.files(path))
+        self._keep = keep
+
+        with profiling.phase('load'):
+            if not settings.snapshot_cache:
+                with open(path, 'r') as f:
+                    self._parse(f, keep)
+            else:
+                with open(path, 'rb') as f:
+                    data = f.read()
+
+                if not self._load_snapshot(path, data, keep):
+                    self._parse(io.StringIO(data.decode()), keep)
+                    with profiling.phase('write snapshot'):
+                        self._write_snapshot(path, data)
+
+        self._mark_clean()
+
+    def _parse(self, f, keep):
+        if keep is None:
+            with profiling.phase('json.load'):
+                records = json.load(f)
+        else:
+            records = self._kept_records(f, keep)
+
+        with profiling.phase('build tasks'):
+            self._add_stored([Task.from_record(data) for data in records])
+
+    def _load_snapshot(self, path, data, keep):
+        # see snapshot.py
+        with profiling.phase('read snapshot'):
+            snap = snapshot.read(path, data)
+        if snap is None:
+            return False
+
+        rows, skipped = snap
+        with profiling.phase('build tasks'):
+            self._add_stored([Task.from_row(row) for row in rows])
+
+            for id, name, text in skipped:
+                self._skipped[id] = (name, text)
+            if keep is None:
+                self.load_skipped()
+
+        return True
+
+    def _write_snapshot(self, path, data):
+        snapshot.write(path, data, [t.to_row() for t in self.items],
+                       [(id, name, text)
+                        for id, (name, text) in self._skipped.items()])
+
+    def _kept_records(self, f, keep):
+        for record, text in jsonstream.iter_array(f):
+            id = record.get('id')
+
+            if id is None or keep(record):
+                yield record
+            else:
+                self._skipped[id] = (record.get('name', ''), text)
+
+    def _unskip(self, id):
+        # build the task for a record skipped by load, as if it had been
+        # loaded all along
+        _, text = self._skipped.pop(id)
+        task = Task.from_record(json.loads(text))
+        self.add(task)
+        # it was stored all along, so it is not new
+        self._added.popitem()
+        if self._undo is not None:
+            self._undo.pop()
+        return task
+
+    def load_skipped(self):
+        """Build tasks for all the records skipped by load."""
+        for id in list(self._skipped):
+            self._unskip(id)
+
+    def names(self):
+        """Yield the display id and name of every stored task, including
+        those skipped by load."""
+        for t in self:
+            yield t.display_id, t.name
+
+        for id, (name, _) in self._skipped.items():
+            yield base36(id), name
 
     def find_by_id(self, id):
         if type(id) == str:
             id = int(id, 36)
 
-        for task in self.items:
-            if task.id == id:
-                return task
+        task = self._index.get(id)
+        if task is None and id in self._skipped:
+            task = self._unskip(id)
 
-        return None
+        return task
+
+    @property
+    def columns(self):
+        """Column-oriented copy of the fields tasks are filtered on, rebuilt
+        after any of them change."""
+        if self._columns is None:
+            self._columns = columns.TaskColumns(self.items)
+
+        return self._columns
+
+    @property
+    def due_index(self):
+        """Incomplete tasks in due date order, built on first use."""
+        if self._due_index is None:
+            self._due_index = dueindex.DueIndex(self.columns)
+        else:
+            self._due_index.flush()
+
+        return self._due_index
+
+    def overdue(self, date):
+        """Return incomplete tasks due on or before date, ordered by id."""
+        return sorted(self.due_index.due_by(date.toordinal()), key=_id_key)
+
+    def agenda(self, end, start=None):
+        """Generate (date, task) pairs for everything falling due up to end,
+        in date order (see Task.occurrences). The occurrences of each task
+        are merged lazily, so memory use stays proportional to the number of
+        tasks however far ahead end is."""
+        def _stream(i, task):
+            # the index breaks ties between tasks due on the same day
+            for date in task.occurrences(end, start):
+                yield date, i, task
+
+        streams = [_stream(i, task) for i, task in enumerate(self)
+                   if task.due is not None]
+
+        for date, _, task in heapq.merge(*streams):
+            yield date, task
+
+    def next_due(self, date):
+        """Return the earliest due date after date of an incomplete task."""
+        due = self.due_index.next_due(date.toordinal())
+        return None if due is None else _date(due)
+
+    @property
+    def search_index(self):
+        """Trigram index of task names, built on first use."""
+        if self._search_index is None:
+            self._search_index = search.SearchIndex(self.items)
+        else:
+            for task in self._renamed:
+                if task._collection is self:
+                    self._search_index.add(task)
+
+        self._renamed = []
+
+        return self._search_index
+
+    def select(self, completed=False, recurring_before=None,
+               no_recurring=False, search=(), match_all=False):
+        """Return the tasks matching the given `list` filters, latest due
+        date first.
+
+        Recurring tasks are left out if they are not due before
+        recurring_before (when given). A task matches search if its name
+        contains any of the terms (all of them if match_all is set), ignoring
+        case.
+        """
+        if completed:
+            self.load_skipped()
+
+        if len(search) == 0 and not completed:
+            before = None if recurring_before is None \
+                else recurring_before.toordinal()
+            return self.due_index.select(before, no_recurring)
+
+        if len(search) == 0:
+            return self.columns.select(completed, recurring_before,
+                                       no_recurring)
+
+        selected = self.search_index.search(search, match_all)
+        selected = (t for t in selected if t.completed == completed)
+
+        if recurring_before is not None:
+            selected = (t for t in selected
+                        if not t.recurs or t.due < recurring_before)
+
+        if no_recurring:
+            selected = (t for t in selected if t.schedule is None)
+
+        def _date_sort(t):
+            return dt.date.max if t.due is None else t.due
+
+        return sorted(selected, key=_date_sort, reverse=True)
 
     def find_unused_id(self):
-        id = 0
+        # every unused id below _next_id is guaranteed to be in the heap, so
+        # the smallest unused id is either the top of the heap (once ids that
+        # have since been reused are discarded) or the first gap >= _next_id
+        free = self._free_ids
+        while free and free[0] in self._index:
+            heapq.heappop(free)
+
+        while self._next_id in self._index or self._next_id in self._skipped:
+            self._next_id += 1
 
-        while any(t for t in self.items if t.id == id):
-            id += 1
+        if free and free[0] < self._next_id:
+            return free[0]
 
-        return id
+        return self._next_id
+
+
+def _id_key(task):
+    return -1 if task.id is None else task.id
+
+
+@functools.lru_cache(maxsize=4096)
+def _date(ordinal):
+    return dt.date.fromordinal(ordinal)
+
+
+# due dates as written to the data file are always in settings.date_format,
+# so they skip scheduling.parse_due_date (which is for what users type).
+# There are only ever a few hundred different ones, so both ways are cached.
+
+@functools.lru_cache(maxsize=4096)
+def _parse_stored(text, date_format):
+    if date_format == '%Y-%m-%d':
+        return dt.date.fromisoformat(text).toordinal()
+    return dt.datetime.strptime(text, date_format).toordinal()
+
+
+def _stored_ordinal(text, date_format):
+    try:
+        return _parse_stored(text, date_format)
+    except ValueError:
+        # edited by hand, perhaps (and not cached, as it may be relative)
+        return scheduling.parse_due_date(text).toordinal()
+
+
+@functools.lru_cache(maxsize=4096)
+def _stored_date(ordinal, date_format):
+    return dt.date.fromordinal(ordinal).strftime(date_format)
 
 
 class Task:
+    __slots__ = ('_collection', '_id', 'name', '_due', '_schedule',
+                 'completed', 'recurs')
+
+    # attributes that are written to the data file
+    _stored = frozenset(['id', 'name', 'due', 'schedule', 'completed',
+                         'recurs'])
+
     def __init__(self, **kwargs):
-        self.id = None
+        self._collection = None
+        self._id = None
         self.name = ''
         self._due = None
-        self.schedule = None
+        self._schedule = None
         self.completed = False
         self.recurs = False
 
         for k, v in kwargs.items():
             setattr(self, k, v)
 
+    @classmethod
+    def from_record(cls, data):
+        """Create a task from a record as it is stored on disk, without
+        going through the attribute setters."""
+        t = cls.__new__(cls)
+        init = object.__setattr__
+
+        due = data.get('due')
+        if due is not None:
+            due = _stored_ordinal(due, settings.date_format)
+
+        schedule = data.get('schedule')
+        if schedule is not None:
+            schedule = sys.intern(schedule)
+
+        init(t, '_collection', None)
+        init(t, '_id', data.get('id'))
+        init(t, 'name', data.get('name', ''))
+        init(t, '_due', due)
+        init(t, '_schedule', schedule)
+        init(t, 'completed', data.get('completed', False))
+        init(t, 'recurs', data.get('recurs', False))
+        return t
+
+    @classmethod
+    def from_row(cls, row):
+        """Create a task from a row as returned by to_row."""
+        t = cls.__new__(cls)
+        init = object.__setattr__
+
+        id, name, due, schedule, completed, recurs = row
+        if schedule is not None:
+            schedule = sys.intern(schedule)
+
+        init(t, '_collection', None)
+        init(t, '_id', id)
+        init(t, 'name', name)
+        init(t, '_due', due)
+        init(t, '_schedule', schedule)
+        init(t, 'completed', completed)
+        init(t, 'recurs', recurs)
+        return t
+
+    def to_row(self):
+        """The stored attributes as a tuple of plain values (with the due
+        date as an ordinal), for snapshot.py."""
+        return (self._id, self.name, self._due, self._schedule,
+                self.completed, self.recurs)
+
     def __eq__(self, other):
         return self.id == other.id
 
+    def __setattr__(self, name, value):
+        if name in self._stored and self._collection is not None:
+            self._collection._changing(self, name)
+
+        super().__setattr__(name, value)
+
+    @property
+    def id(self):
+        return self._id
+
+    @id.setter
+    def id(self, i):
+        old_id = self._id
+        self._id = i
+
+        if self._collection is not None:
+            self._collection._reindex(self, old_id)
+
     @property
     def due(self):
-        return self._due
+        return None if self._due is None else _date(self._due)
 
     @due.setter
     def due(self, d):
         if type(d) == str:
-            self._due = scheduling.parse_due_date(d)
-        else:
-            self._due = d
+            d = scheduling.parse_due_date(d)
+
+        self._due = None if d is None else d.toordinal()
+
+    @property
+    def due_ordinal(self):
+        """The due date as a proleptic Gregorian ordinal (or None)."""
+        return self._due
+
+    @property
+    def schedule(self):
+        return self._schedule
+
+    @schedule.setter
+    def schedule(self, s):
+        # there are only ever a handful of different schedules, so share them
+        self._schedule = None if s is None else sys.intern(s)
+
+    @property
+    def compiled_schedule(self):
+        """The parsed scheduling.Schedule for the task's schedule."""
+        if self._schedule is None:
+            return None
+
+        return scheduling.compile_schedule(self._schedule)
 
     @property
     def display_id(self):
@@ -127,7 +849,7 @@ class Task:
             'completed': self.completed
         }
 
-        if self.due:
+        if self._due is not None:
             attrs['due'] = self.due
 
         if self.schedule:
@@ -135,9 +857,28 @@ class Task:
 
         return attrs
 
+    def occurrences(self, end, start=None):
+        """Generate the dates the task falls due on up to end: its current
+        due date, followed by the later ones it will recur on that are on or
+        after start (if given)."""
+        if self.due is None or self.completed or self.due > end:
+            return
+
+        yield self.due
+
+        if not self.recurs or self.schedule is None:
+            return
+
+        dates = self.compiled_schedule.occurrences(self.due, end)
+        next(dates)
+
+        for date in dates:
+            if start is None or date >= start:
+                yield date
+
     def complete(self):
         if self.recurs and self.schedule:
-            self.due = scheduling.next_scheduled(self.schedule, self.due)
+            self.due = self.compiled_schedule.next_after(self.due)
         else:
             self.completed = True
 
@@ -148,21 +889,45 @@ class TaskListDisplay:
     def __init__(self, tasks):
         self.tasks = tasks
         self.show_schedule = False
+        # number of tasks reported in the footer, if tasks is only one page
+        # of them
+        self.total = None
+        # the list each task is on (by id(task)), when showing several
+        self.lists = None
+        self._due_strings = {}
+
+    def _format_due(self, due):
+        # lots of tasks share due dates, so only format each one once
+        s = self._due_strings.get(due)
+        if s is None:
+            s = self._due_strings[due] = due.strftime(self.date_format)
+
+        return s
 
     def _calculate_column_widths(self):
+        list_width = id_width = task_width = due_width = sched_width = 0
+
+        for t in self.tasks:
+            if self.lists is not None:
+                list_width = max(list_width, len(self.lists[id(t)]))
+            id_width = max(id_width, len(t.display_id))
+            task_width = max(task_width, len(t.name))
+
+            if t.due is not None:
+                due_width = max(due_width, len(self._format_due(t.due)))
+
+            if self.show_schedule and t.schedule is not None:
+                sched_width = max(sched_width, len(t.schedule))
+
         widths = {
-            'id': max(map(lambda t: len(t.display_id), self.tasks)),
-            'task': max(map(lambda t: len(t.name), self.tasks)),
+            'id': id_width,
+            'task': task_width,
+            'due': due_width,
+            'schedule': sched_width,
         }
 
-        def _due(due):
-            return 0 if due is None else len(due.strftime(self.date_format))
-        widths['due'] = max(map(_due, [t.due for t in self.tasks]))
-
-        def _sched(sched):
-            return len(sched) if sched is not None else 0
-        widths['schedule'] = 0 if not self.show_schedule \
-            else max(map(_sched, [t.schedule for t in self.tasks]))
+        if self.lists is not None:
+            widths = dict(list=list_width, **widths)
 
         for title in widths:
             if 0 < widths[title] < len(title):
@@ -173,7 +938,8 @@ class TaskListDisplay:
     @property
     def col_widths(self):
         if not hasattr(self, '_column_widths'):
-            self._calculate_column_widths()
+            with profiling.phase('column widths'):
+                self._calculate_column_widths()
 
         return self._column_widths
 
@@ -195,47 +961,64 @@ class TaskListDisplay:
 
         return self._total_width
 
-    def _generate_output(self):
-        output = []
+    def lines(self):
+        """Generate the lines of the table one at a time."""
+        if len(self.tasks) == 0:
+            yield 'No tasks found.'
+            return
+
+        widths = self.col_widths
         bar = '-' * self.total_width
 
         line = ''
-        for heading in ['id', 'task', 'due', 'schedule']:
-            if self.col_widths[heading] > 0:
-                line += heading.title().ljust(self.col_widths[heading] + 2)
-            line.rstrip()
+        for heading in widths:
+            if widths[heading] > 0:
+                line += heading.title().ljust(widths[heading] + 2)
 
-        output.append(line)
-        output.append(bar)
+        yield line
+        yield bar
 
         for t in self.tasks:
-            line = t.display_id.ljust(self.col_widths['id'] + 2)
-            line += t.name.ljust(self.col_widths['task'] + 2)
+            line = ''
+            if self.lists is not None:
+                line = self.lists[id(t)].ljust(widths['list'] + 2)
+
+            # archived tasks have no id, so the column may be empty
+            if widths['id'] > 0:
+                line += t.display_id.ljust(widths['id'] + 2)
+            line += t.name.ljust(widths['task'] + 2)
 
             if t.due is not None:
-                line += t.due.strftime(self.date_format) \
-                    .ljust(self.col_widths['due'] + 2)
-            elif self.col_widths['due'] > 0:
-                line += ' ' * (self.col_widths['due'] + 2)
+                line += self._format_due(t.due).ljust(widths['due'] + 2)
+            elif widths['due'] > 0:
+                line += ' ' * (widths['due'] + 2)
 
             if self.show_schedule:
                 if t.schedule is not None:
-                    line += t.schedule.ljust(self.col_widths['schedule'] + 2)
-                elif self.col_widths['schedule'] > 0:
-                    line += ' ' * (self.col_widths['schedule'] + 2)
+                    line += t.schedule.ljust(widths['schedule'] + 2)
+                elif widths['schedule'] > 0:
+                    line += ' ' * (widths['schedule'] + 2)
 
-            if line.endswith('  '):
-                line.rstrip()
+            yield line
 
-            output.append(line)
+        total = len(self.tasks) if self.total is None else self.total
+        yield bar
+        yield f'{total} total tasks'
 
-        output.append(bar)
-        output.append(f'{len(self.tasks)} total tasks')
-        self._output = output
+    def chunks(self, size=500):
+        """Generate the table in blocks of up to size lines, so it can be
+        written out without building the whole thing in memory."""
+        chunk = []
 
-    def output(self):
-        if len(self.tasks) == 0:
-            return 'No tasks found.'
+        for line in self.lines():
+            chunk.append(line)
 
-        self._generate_output()
-        return '\n'.join(self._output)
+            if len(chunk) == size:
+                yield '\n'.join(chunk)
+                chunk = []
+
+        if chunk:
+            yield '\n'.join(chunk)
+
+    def output(self):
+        return '\n'.join(self.lines())
@@ -0,0 +1,141 @@
+"""Opt-in timing of the phases a command goes through.
+
+Profiling is off unless `task --profile` is used (which prints a summary)
+or PYTASKS_PROFILE is set in the environment, whose value says where the
+results go: `1` or `-` prints a summary of each phase's wall time and the
+memory blocks it left allocated to stderr, a path ending in `.json` gets the
+same as a JSON trace and a path ending in `.prof` gets cProfile stats for
+the whole command (readable with `python -m pstats`). Run with
+PYTHONTRACEMALLOC=1 to also record how many bytes each phase left allocated.
+
+Code marks its phases with `with profiling.phase('name'):`, which costs
+next to nothing while profiling is off (and what is only needed while it is
+on is only imported then).
+"""
+import atexit
+import contextlib
+import os
+import sys
+import time
+
+
+enabled = False
+
+_started = time.perf_counter()
+_output = None
+_profiler = None
+_phases = []
+# how deeply phases are nested, by thread; a thread's first phase nests in
+# whatever phase the main thread is in
+_depths = {}
+_off = contextlib.nullcontext()
+
+
+class _Phase:
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        import threading
+        import tracemalloc
+
+        thread = threading.get_ident()
+        depth = _depths.get(thread, _depths.get(threading.main_thread().ident,
+                                                0))
+
+        # keep phases in the order they started, with nested ones after the
+        # phase they are part of
+        self.record = {'phase': self.name, 'depth': depth}
+        _phases.append(self.record)
+        _depths[thread] = depth + 1
+
+        if tracemalloc.is_tracing():
+            self.memory = tracemalloc.get_traced_memory()[0]
+        self.blocks = sys.getallocatedblocks()
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        import threading
+        import tracemalloc
+
+        self.record['seconds'] = time.perf_counter() - self.start
+        self.record['blocks'] = sys.getallocatedblocks() - self.blocks
+        if tracemalloc.is_tracing():
+            self.record['bytes'] = \
+                tracemalloc.get_traced_memory()[0] - self.memory
+        _depths[threading.get_ident()] = self.record['depth']
+
+
+def phase(name):
+    """Return a context manager that records the time spent in it as a
+    phase called name."""
+    if not enabled:
+        return _off
+
+    return _Phase(name)
+
+
+def mark(name):
+    """Record the time since this module was imported as a phase called
+    name, whether or not profiling is on yet (so that a command line option
+    turning it on can still account for startup)."""
+    _phases.append({'phase': name, 'depth': 0,
+                    'seconds': time.perf_counter() - _started,
+                    'blocks': None})
+
+
+def start(output='-'):
+    """Turn profiling on for the rest of the process, reporting to output
+    when it exits."""
+    global enabled, _output, _profiler
+
+    if enabled:
+        return
+
+    enabled = True
+    _output = output
+
+    if output.endswith('.prof'):
+        import cProfile
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+
+    atexit.register(_finish)
+
+
+def summary():
+    total = time.perf_counter() - _started
+    lines = [f'profile: {total * 1000:.1f} ms total']
+
+    for p in _phases:
+        if 'seconds' not in p:
+            # still running, e.g. when a command exits from inside a phase
+            continue
+
+        name = '  ' * p['depth'] + p['phase']
+        line = f'  {name:<28}{p["seconds"] * 1000:10.1f} ms'
+        if p['blocks'] is not None:
+            line += f'{p["blocks"]:+12} blocks'
+        if 'bytes' in p:
+            line += f'{p["bytes"] / 1024:+12.1f} KiB'
+        lines.append(line)
+
+    return '\n'.join(lines)
+
+
+def _finish():
+    if _profiler is not None:
+        _profiler.disable()
+        _profiler.dump_stats(_output)
+    elif _output.endswith('.json'):
+        import json
+        with open(_output, 'w') as f:
+            json.dump({'argv': sys.argv,
+                       'seconds': time.perf_counter() - _started,
+                       'phases': _phases}, f, indent=2)
+    else:
+        print(summary(), file=sys.stderr)
+
+
+if os.environ.get('PYTASKS_PROFILE'):
+    start(os.environ['PYTASKS_PROFILE'])
@@ -0,0 +1,248 @@
+"""Task storage as fixed-size records, read through mmap.
+
+`tasks.rec` holds a short header followed by one record per task id, so
+task n is always at the same offset and can be read (or rewritten) on its
+own:
+
+    id        int64    -1 if the slot is free
+    due       int32    proleptic Gregorian ordinal, 0 if there is none
+    flags     uint8    columns.COMPLETED, RECURS and SCHEDULED
+    name      int64 offset and uint32 length into the heap
+    schedule  int64 offset and uint32 length into the heap
+
+Names and schedules are UTF-8 strings in `tasks.heap`, which is only ever
+appended to: a renamed task points at its new name, and the old one stays
+behind until the files are rewritten in full. Strings are written before
+the records pointing at them, so a reader never sees a record whose strings
+are missing.
+"""
+import array
+import mmap
+import os
+import struct
+
+import columns
+import fsutil
+
+
+MAGIC = b'PYTASKR1'
+RECORD = struct.Struct('<qiB3xqIqI')
+FREE = -1
+
+
+def _dtype(numpy):
+    # RECORD as a NumPy structured type
+    return numpy.dtype([('id', '<i8'), ('due', '<i4'), ('flags', 'u1'),
+                        ('pad', 'V3'), ('name', '<i8'), ('name_length', '<u4'),
+                        ('schedule', '<i8'), ('schedule_length', '<u4')])
+
+
+def _free_record():
+    return RECORD.pack(FREE, 0, 0, 0, 0, 0, 0)
+
+
+class _Heap:
+    # strings to append to the heap, which starts at offset end
+    def __init__(self, end):
+        self.end = end
+        self.chunks = []
+        self.offsets = {}
+
+    def add(self, text, share=False):
+        # schedules are shared between tasks, names are not worth looking up
+        if share and text in self.offsets:
+            return self.offsets[text]
+
+        data = text.encode('utf-8')
+        place = (self.end, len(data))
+        self.chunks.append(data)
+        self.end += len(data)
+
+        if share:
+            self.offsets[text] = place
+        return place
+
+    def data(self):
+        return b''.join(self.chunks)
+
+
+def _pack(row, name, schedule):
+    id, _, due, _, completed, recurs = row
+    flags = (columns.COMPLETED if completed else 0) | \
+        (columns.RECURS if recurs else 0) | \
+        (columns.SCHEDULED if schedule is not None else 0)
+    schedule = schedule or (0, 0)
+    return RECORD.pack(id, due or 0, flags, *name, *schedule)
+
+
+def create(path, heap_path, rows):
+    """Write record and heap files holding rows (see Task.to_row), replacing
+    any there were."""
+    heap = _Heap(0)
+    records = {}
+
+    for row in rows:
+        schedule = None if row[3] is None else heap.add(row[3], share=True)
+        records[row[0]] = _pack(row, heap.add(row[1]), schedule)
+
+    slots = max(records, default=-1) + 1
+    free = _free_record()
+
+    fsutil.atomic_write(heap_path, heap.data())
+    fsutil.atomic_write(path, MAGIC + b''.join(records.get(slot, free)
+                                               for slot in range(slots)))
+
+
+def _map(fd):
+    if os.fstat(fd).st_size == 0:
+        return b''
+    return mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+
+
+class RecordFile:
+    """A record file and its heap, open for reading through mmap and for
+    writing single records in place."""
+
+    def __init__(self, path, heap_path):
+        self.path = path
+        self.heap_path = heap_path
+        self._fd = self._heap_fd = None
+        self.refresh()
+
+    def close(self):
+        for fd in (self._fd, self._heap_fd):
+            if fd is not None:
+                os.close(fd)
+
+        self._fd = self._heap_fd = None
+
+    def refresh(self):
+        """Map the files again, to see records added since (and reopen them
+        if they have been rewritten in full)."""
+        if self._fd is None or \
+                os.fstat(self._fd).st_ino != os.stat(self.path).st_ino:
+            self.close()
+            self._fd = os.open(self.path, os.O_RDWR)
+            self._heap_fd = os.open(self.heap_path, os.O_RDWR)
+
+        # the old maps are left for the garbage collector, as arrays handed
+        # out by fields may still be viewing them
+        self._records = _map(self._fd)
+        self._heap = _map(self._heap_fd)
+
+        if self._records[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{self.path} is not a task record file')
+
+    def __len__(self):
+        return (len(self._records) - len(MAGIC)) // RECORD.size
+
+    def record(self, slot):
+        return RECORD.unpack_from(self._records,
+                                  len(MAGIC) + slot * RECORD.size)
+
+    def occupied(self, slot):
+        return 0 <= slot < len(self) and self.record(slot)[0] != FREE
+
+    def string(self, offset, length):
+        if offset + length > len(self._heap):
+            # written by another process since the heap was mapped
+            self.refresh()
+        return str(self._heap[offset:offset + length], 'utf-8')
+
+    def name(self, slot):
+        record = self.record(slot)
+        return self.string(record[3], record[4])
+
+    def row(self, slot):
+        """Return the task in slot as a Task.to_row tuple, or None if the
+        slot is free."""
+        id, due, flags, name, name_length, schedule, schedule_length = \
+            self.record(slot)
+        if id == FREE:
+            return None
+
+        if flags & columns.SCHEDULED:
+            schedule = self.string(schedule, schedule_length)
+        else:
+            schedule = None
+
+        return (id, self.string(name, name_length), due or None, schedule,
+                bool(flags & columns.COMPLETED), bool(flags & columns.RECURS))
+
+    def fields(self):
+        """Return the id, due and flags fields of every slot as arrays (NumPy
+        arrays viewing the mapped file, if NumPy is installed)."""
+        count = len(self)
+
+        numpy = columns.load_numpy(count)
+        if numpy is not None:
+            if count == 0:
+                records = numpy.zeros(0, _dtype(numpy))
+            else:
+                records = numpy.frombuffer(self._records, _dtype(numpy),
+                                           count, len(MAGIC))
+            return records['id'], records['due'], records['flags']
+
+        ids, due, flags = array.array('q'), array.array('q'), \
+            array.array('B')
+        end = len(MAGIC) + count * RECORD.size
+        for record in RECORD.iter_unpack(
+                memoryview(self._records)[len(MAGIC):end]):
+            ids.append(record[0])
+            due.append(record[1])
+            flags.append(record[2])
+
+        return ids, due, flags
+
+    def _write(self, slot, data):
+        os.pwrite(self._fd, data, len(MAGIC) + slot * RECORD.size)
+
+    def free(self, slots):
+        """Mark slots free."""
+        for slot in slots:
+            if slot < len(self):
+                self._write(slot, _free_record())
+
+    def put(self, rows):
+        """Write rows (see Task.to_row) to the slots for their ids, keeping
+        the strings that have not changed where they are."""
+        heap = _Heap(os.fstat(self._heap_fd).st_size)
+        records = {}
+
+        for row in rows:
+            old = self.record(row[0]) if row[0] < len(self) else None
+            if old is not None and old[0] == row[0] and \
+                    self.string(old[3], old[4]) == row[1]:
+                name = old[3:5]
+            else:
+                name = heap.add(row[1])
+
+            if row[3] is None:
+                schedule = None
+            elif old is not None and old[0] == row[0] and \
+                    old[2] & columns.SCHEDULED and \
+                    self.string(old[5], old[6]) == row[3]:
+                schedule = old[5:7]
+            else:
+                schedule = heap.add(row[3], share=True)
+
+            records[row[0]] = _pack(row, name, schedule)
+
+        data = heap.data()
+        if data:
+            os.pwrite(self._heap_fd, data, heap.end - len(data))
+
+        # slots past the end are added in one write, with free records
+        # filling any gap
+        count = len(self)
+        for slot in sorted(records):
+            if slot < count:
+                self._write(slot, records[slot])
+
+        end = max(records, default=-1) + 1
+        if end > count:
+            free = _free_record()
+            self._write(count, b''.join(records.get(slot, free)
+                                        for slot in range(count, end)))
+
+        self.refresh()
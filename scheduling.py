@@ -1,14 +1,31 @@
 import calendar
 import datetime
+import functools
 import settings
 
 
+DAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday',
+        'sunday')
+
+
 class SchedulingError(Exception):
     pass
 
 
-def parse_due_date(_d, start=datetime.date.today()):
+def add_months(start, months):
+    """Move a date by a number of months, keeping the day of the month where
+    possible and using the last day of the month where it isn't."""
+    year, month = divmod(start.month - 1 + months, 12)
+    year += start.year
+    day = min(start.day, calendar.monthrange(year, month + 1)[1])
+    return start.replace(year=year, month=month + 1, day=day)
+
+
+def parse_due_date(_d, start=None):
     """Create a datetime.date object from a given string."""
+    if start is None:
+        start = datetime.date.today()
+
     d = _d.lower()
 
     if d == 'today':
@@ -28,12 +45,20 @@ def parse_due_date(_d, start=datetime.date.today()):
         return start + datetime.timedelta(days=diff)
 
     if d.isdigit():
-        new_date = start.replace(day=int(d))
+        # the next time that day of the month comes around, skipping months
+        # that are too short to have it
+        day = int(d)
+        if not 1 <= day <= 31:
+            raise SchedulingError(f'{_d} is not a valid date specification.')
 
-        if new_date < start:
-            return new_date.replace(month=new_date.month + 1)
+        month = start.replace(day=1)
+        while True:
+            if day <= calendar.monthrange(month.year, month.month)[1]:
+                new_date = month.replace(day=day)
+                if new_date >= start:
+                    return new_date
 
-        return new_date
+            month = add_months(month, 1)
 
     try:
         return datetime.datetime.strptime(d, settings.date_format).date()
@@ -43,35 +68,109 @@ def parse_due_date(_d, start=datetime.date.today()):
     raise SchedulingError(f'{_d} is not a valid date specification.')
 
 
-def next_scheduled(schedule, start=datetime.date.today()):
-    """Create a datetime.date object from a given schedule and start date."""
-    err = f'{schedule} is not a valid schedule specification.'
+class Schedule:
+    """A recurrence schedule, parsed from a string such as "2 weeks",
+    "1 month", "weekdays" or "monday,thursday".
+
+    Use compile_schedule() to get one, so each distinct schedule string is
+    only parsed once.
+    """
+
+    def __init__(self, spec, days=None, months=None, weekdays=()):
+        self.spec = spec
+        self.days = days
+        self.months = months
+        self.weekdays = tuple(sorted(weekdays))
+
+    def __repr__(self):
+        return f'Schedule({self.spec!r})'
+
+    @classmethod
+    def parse(cls, spec):
+        err = f'{spec} is not a valid schedule specification.'
+        s = spec.lower()
+
+        if ' ' in s:
+            pieces = s.split()
+            try:
+                number = int(pieces[0])
+            except ValueError:
+                raise SchedulingError(err)
+
+            frequency = pieces[1]
+
+            if 'day' in frequency:
+                return cls(spec, days=number)
 
-    if ' ' in schedule:
-        pieces = schedule.split()
-        try:
-            number = int(pieces[0])
-        except ValueError:
-            raise SchedulingError(err)
+            if 'week' in frequency:
+                return cls(spec, days=number * 7)
 
-        frequency = pieces[1].lower()
+            if 'month' in frequency:
+                return cls(spec, months=number)
 
-        if 'day' in frequency:
-            return start + datetime.timedelta(days=number)
+            if 'year' in frequency:
+                return cls(spec, months=number * 12)
 
-        if 'week' in frequency:
-            return start + datetime.timedelta(days=number * 7)
+        if 'weekday' in s:
+            return cls(spec, weekdays=range(5))
 
-        if 'month' in frequency:
-            return start.replace(month=start.month + number)
+        if any(d in s for d in DAYS):
+            weekdays = set()
 
-        if 'year' in frequency:
-            return start.replace(year=start.year + number)
+            for d in s.split(','):
+                if d.strip() not in DAYS:
+                    raise SchedulingError(err)
+                weekdays.add(DAYS.index(d.strip()))
 
-    if 'weekday' in schedule.lower():
-        schedule = 'monday,tuesday,wednesday,thursday,friday'
+            return cls(spec, weekdays=weekdays)
 
-    if any(d.lower() in schedule.lower() for d in calendar.day_name):
-        return min(parse_due_date(d, start) for d in schedule.split(','))
+        raise SchedulingError(err)
+
+    def next_after(self, start):
+        """Return the first date after start that the schedule falls on."""
+        if self.days is not None:
+            return start + datetime.timedelta(days=self.days)
+
+        if self.months is not None:
+            return add_months(start, self.months)
+
+        # days until the next listed weekday, a full week if it's today's
+        weekday = start.weekday()
+        diff = min((day - weekday) % 7 or 7 for day in self.weekdays)
+        return start + datetime.timedelta(days=diff)
+
+    def occurrences(self, start, end=None):
+        """Generate start and the dates the schedule falls on after it, up
+        to and including end (forever if end is None)."""
+        date = start
+        n = 0
+
+        while end is None or date <= end:
+            yield date
+            n += 1
+
+            if self.months is not None:
+                # step from start each time so a schedule on the 31st goes
+                # back to the 31st after passing through shorter months
+                date = add_months(start, n * self.months)
+            else:
+                date = self.next_after(date)
+
+            if date <= start:
+                # a zero-length step would repeat forever
+                return
+
+
+@functools.lru_cache(maxsize=128)
+def compile_schedule(spec):
+    """Return the Schedule for a schedule string, parsing each distinct
+    string only once (up to a point)."""
+    return Schedule.parse(spec)
+
+
+def next_scheduled(schedule, start=None):
+    """Create a datetime.date object from a given schedule and start date."""
+    if start is None:
+        start = datetime.date.today()
 
-    raise SchedulingError(err)
+    return compile_schedule(schedule).next_after(start)
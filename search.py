@@ -0,0 +1,91 @@
+import collections
+
+
+class SearchIndex:
+    """Trigram index over task names for case-insensitive substring search.
+
+    Tasks are keyed by identity, since new tasks have no id yet. Search
+    terms of three or more characters are looked up through their trigrams
+    and then checked against the (already lowercased) names; shorter terms
+    fall back to checking every name.
+    """
+
+    def __init__(self, tasks=()):
+        self._names = {}
+        self._tasks = {}
+        self._order = {}
+        self._trigrams = collections.defaultdict(set)
+        self._count = 0
+
+        for t in tasks:
+            self.add(t)
+
+    def __len__(self):
+        return len(self._tasks)
+
+    @staticmethod
+    def _split(text):
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def add(self, task):
+        key = id(task)
+        if key in self._tasks:
+            self.remove(task)
+
+        name = task.name.lower()
+        self._names[key] = name
+        self._tasks[key] = task
+        self._order[key] = self._count
+        self._count += 1
+
+        for trigram in self._split(name):
+            self._trigrams[trigram].add(key)
+
+    def remove(self, task):
+        key = id(task)
+        if key not in self._tasks:
+            return
+
+        for trigram in self._split(self._names[key]):
+            keys = self._trigrams[trigram]
+            keys.discard(key)
+            if not keys:
+                del self._trigrams[trigram]
+
+        del self._names[key]
+        del self._tasks[key]
+        del self._order[key]
+
+    def _matching(self, term):
+        term = term.lower()
+
+        if len(term) < 3:
+            candidates = self._names.keys()
+        else:
+            trigrams = sorted((self._trigrams.get(t, set())
+                               for t in self._split(term)), key=len)
+            candidates = set.intersection(*trigrams)
+
+        return {key for key in candidates if term in self._names[key]}
+
+    def search(self, terms, match_all=False):
+        """Return the tasks whose names contain any of the terms (or all of
+        them, if match_all is set), each one once, in the order they were
+        added."""
+        matches = None
+
+        for term in terms:
+            found = self._matching(term)
+
+            if matches is None:
+                matches = found
+            elif match_all:
+                matches &= found
+            else:
+                matches |= found
+
+        if not matches:
+            return []
+
+        return [self._tasks[key] for key in sorted(matches,
+                                                   key=self._order.get)]
@@ -8,3 +8,31 @@ else:
     data_file = os.path.join(os.getenv('HOME'), '.tasks.json')
 
 date_format = '%Y-%m-%d'
+
+runtime_dir = os.getenv('XDG_RUNTIME_DIR') or '/tmp'
+completion_socket = os.path.join(runtime_dir, f'pytasks-{os.getuid()}.sock')
+
+# write ready-to-print completion and status output next to the data file
+# on save
+completion_cache = True
+status_cache = True
+
+# keep a binary snapshot of the data file next to it, so loading does not
+# have to parse the JSON again until it changes
+snapshot_cache = True
+
+# how tasks are stored: 'json' rewrites the data file on every change,
+# 'journal' appends changes to a log next to it and compacts occasionally,
+# 'sqlite' keeps them in an indexed database next to it and 'records' in
+# fixed-size records that are read through mmap and rewritten in place
+storage_backend = 'json'
+journal_compact_threshold = 1000
+
+# with the 'json' and 'journal' backends, move completed tasks out of the
+# data file into append-only archive segments next to it on save, where
+# `list --completed` still finds them; `clean-cache` then drops archived
+# tasks older than archive_retention_days (None keeps them forever) instead
+# of deleting completed tasks outright
+archive_completed = False
+archive_segment_size = 10000
+archive_retention_days = None
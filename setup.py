@@ -10,7 +10,7 @@ setup(
     ],
     entry_points={
         'console_scripts': [
-            'task=tasks:cli'
+            'task=fast:main'
         ]
     }
 )
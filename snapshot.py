@@ -0,0 +1,59 @@
+"""Binary snapshot of the data file, for loading it without parsing JSON.
+
+Saving (or loading, when the data file had to be parsed) writes
+`tasks.json.snapshot` next to the data file: the tasks as marshalled rows of
+plain values, the records left out by a selective load as the text they had,
+and the size, modification time and a hash of the data file they match.
+Loading only uses the snapshot while all three still match the data file,
+so the data file is always the one that counts and editing it by hand just
+means the next load parses it again.
+"""
+import hashlib
+import marshal
+import os
+
+import fsutil
+
+
+# bumped whenever what is in a snapshot changes shape
+FORMAT = 1
+
+
+def snapshot_path(path):
+    return f'{path}.snapshot'
+
+
+def _digest(data):
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def write(path, data, rows, skipped):
+    """Write the snapshot for the data file at path, which holds data
+    (bytes): rows for its tasks (see Task.to_row) and (id, name, text) for
+    the records that were left as text."""
+    st = os.stat(path)
+    key = (st.st_size, st.st_mtime_ns, _digest(data))
+    fsutil.atomic_write(snapshot_path(path), marshal.dumps(
+        (FORMAT, key, rows, skipped)))
+
+
+def read(path, data):
+    """Return the (rows, skipped) of the snapshot for the data file at path,
+    which holds data (bytes), or None if there is no snapshot matching
+    it."""
+    try:
+        with open(snapshot_path(path), 'rb') as f:
+            # much faster than marshal.load, which reads a little at a time
+            snapshot = marshal.loads(f.read())
+        format, key, rows, skipped = snapshot
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+    if format != FORMAT:
+        return None
+
+    st = os.stat(path)
+    if key[:2] != (st.st_size, st.st_mtime_ns) or key[2] != _digest(data):
+        return None
+
+    return rows, skipped
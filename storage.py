@@ -0,0 +1,908 @@
+import collections.abc
+import contextlib
+import datetime
+import glob
+import json
+import os
+import sqlite3
+
+import columns
+import fsutil
+import models
+import profiling
+import recordfile
+import settings
+
+
+class JournalTaskCollection(models.TaskCollection):
+    """Task collection that appends changes to a journal instead of
+    rewriting the whole data file on every save.
+
+    The data file itself stays a plain JSON snapshot. Each save appends one
+    record per added, changed or removed task to a journal file next to it,
+    and loading replays the journal on top of the snapshot. Once the journal
+    grows past settings.journal_compact_threshold records it is folded back
+    into the snapshot.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._journal_length = 0
+
+    @staticmethod
+    def journal_path(path):
+        return f'{path}.journal'
+
+    @classmethod
+    def exists(cls, path):
+        return os.path.exists(path) or os.path.exists(cls.journal_path(path))
+
+    @classmethod
+    def files(cls, path):
+        return [path, cls.journal_path(path)]
+
+    def load(self, path, keep=None):
+        stamp = fsutil.stamp(self.files(path))
+
+        if os.path.exists(path):
+            super().load(path, keep)
+
+        self._stamp = stamp
+        journal = self.journal_path(path)
+        if not os.path.exists(journal):
+            return
+
+        with profiling.phase('replay journal'), open(journal, 'r') as f:
+            for line in f:
+                # a line without a newline is still being appended
+                if not line.endswith('\n'):
+                    break
+
+                if line.strip() == '':
+                    continue
+
+                self._replay(json.loads(line))
+                self._journal_length += 1
+
+        self._mark_clean()
+
+    def _replay(self, record):
+        # records are absolute (set task n to this, or delete task n), so
+        # replaying a journal that was already folded into the snapshot is
+        # harmless
+        t = self.find_by_id(record['id'])
+
+        if record['op'] == 'delete':
+            if t is not None:
+                self.remove(t)
+            return
+
+        data = record['task']
+        if t is None:
+            self.add(models.Task.from_record(data))
+            return
+
+        t.due = None
+        t.schedule = None
+        for k, v in data.items():
+            setattr(t, k, v)
+
+    def _write(self, path):
+        renumbered = any(t.id != old_id
+                         for t, old_id, _ in self._changed.values())
+        records = len(self._added) + len(self._changed) + len(self._removed)
+        threshold = settings.journal_compact_threshold
+
+        if renumbered or self._journal_length + records > threshold \
+                or not os.path.exists(path):
+            self._compact(path)
+            return
+
+        lines = [{'op': 'delete', 'id': id} for id in self._removed]
+        lines.extend({'op': 'put', 'id': t.id, 'task': t}
+                     for t, _, _ in self._changed.values())
+        lines.extend({'op': 'put', 'id': t.id, 'task': t}
+                     for t in self._added.values())
+
+        # one write, so the lines of concurrent saves never interleave
+        with open(self.journal_path(path), 'a') as f:
+            f.write(''.join(json.dumps(line, cls=models.TaskJSONEncoder) +
+                            '\n' for line in lines))
+
+        self._journal_length += len(lines)
+
+    def _compact(self, path):
+        super()._write(path)
+
+        journal = self.journal_path(path)
+        if os.path.exists(journal):
+            os.remove(journal)
+
+        self._journal_length = 0
+
+    def compact(self, path):
+        """Write a full snapshot and discard the journal."""
+        self.assign_ids()
+        self._compact(path)
+        self._after_save(path)
+
+
+class SQLiteTaskCollection(models.TaskCollection):
+    """Task collection stored in an SQLite database next to the data file.
+
+    Tasks are only built for the rows a command actually asks for: lookups,
+    `list` and `status` filters run as SQL queries against indexed columns,
+    and saving writes one statement per added, changed or removed task. The
+    database is created from the JSON data file the first time it is opened.
+    """
+
+    fields = 'id, name, due, schedule, completed, recurs'
+
+    def __init__(self):
+        super().__init__()
+        self._db = None
+        self._complete = False
+        # tasks built from rows, by the id of the row, which stops being
+        # their id if they are renumbered before the next save
+        self._stored = {}
+
+    @staticmethod
+    def database_path(path):
+        return os.path.splitext(path)[0] + '.db'
+
+    @classmethod
+    def exists(cls, path):
+        return os.path.exists(path) or os.path.exists(cls.database_path(path))
+
+    @classmethod
+    def files(cls, path):
+        return [cls.database_path(path)]
+
+    def _connect(self, path):
+        if self._db is not None:
+            return self._db
+
+        db_path = self.database_path(path)
+        migrating = not os.path.exists(db_path) and os.path.exists(path)
+
+        self._db = sqlite3.connect(db_path)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                due TEXT,
+                schedule TEXT,
+                completed INTEGER NOT NULL DEFAULT 0,
+                recurs INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS tasks_due ON tasks (due);
+            CREATE INDEX IF NOT EXISTS tasks_completed ON tasks (completed);
+            CREATE INDEX IF NOT EXISTS tasks_recurs ON tasks (recurs);
+        """)
+
+        if migrating:
+            migrate(path, self._db)
+
+        return self._db
+
+    def load(self, path, keep=None):
+        # rows are only read as they are asked for anyway
+        self._connect(path)
+        self._mark_clean()
+
+    def _task(self, row):
+        # reuse tasks that have already been built so changes to them are
+        # tracked in one place
+        t = self._stored.get(row[0])
+        if t is not None:
+            return t
+
+        id, name, due, schedule, completed, recurs = row
+        t = models.Task(id=id, name=name, schedule=schedule,
+                        completed=bool(completed), recurs=bool(recurs))
+        if due is not None:
+            t.due = datetime.date.fromisoformat(due)
+
+        self.items.append(t)
+        self._index.setdefault(id, t)
+        self._stored[id] = t
+        t._collection = self
+        return t
+
+    def _query(self, where='', params=(), order='id', match=None, key=None):
+        """Return the tasks for the rows matching where, in order, along
+        with the unsaved tasks for which match is true (and with them all
+        sorted by key, which must agree with order), as the rows of those
+        do not say what they hold yet."""
+        tasks, stale = _unsaved(self)
+        found = []
+
+        if self._db is not None:
+            rows = self._db.execute(
+                f'SELECT {self.fields} FROM tasks {where} ORDER BY {order}',
+                params)
+            found = [self._task(row) for row in rows if row[0] not in stale]
+
+        if match is not None:
+            tasks = [t for t in tasks if match(t)]
+            if tasks:
+                found = sorted(found + tasks, key=key or _id_field)
+
+        return found
+
+    def _load_all(self):
+        if not self._complete:
+            self._query()
+            self._complete = True
+
+    @property
+    def fully_loaded(self):
+        return self._complete
+
+    def __iter__(self):
+        self._load_all()
+        return super().__iter__()
+
+    def __getitem__(self, idx):
+        self._load_all()
+        return super().__getitem__(idx)
+
+    def __len__(self):
+        self._load_all()
+        return super().__len__()
+
+    def find_by_id(self, id):
+        if type(id) == str:
+            id = int(id, 36)
+
+        if id in self._index or id in self._removed or self._complete:
+            return self._index.get(id)
+
+        found = self._query('WHERE id = ?', (id,))
+        return found[0] if found else None
+
+    def find_unused_id(self):
+        if self._db is None:
+            return super().find_unused_id()
+
+        # smallest free id from 0 up, skipping ids already handed to tasks
+        # that have not been saved yet
+        id = 0
+        while True:
+            id = self._db.execute("""
+                SELECT :id
+                WHERE NOT EXISTS (SELECT 1 FROM tasks WHERE id = :id)
+                UNION ALL
+                SELECT id + 1 FROM tasks t WHERE id >= :id
+                AND NOT EXISTS (SELECT 1 FROM tasks WHERE id = t.id + 1)
+                ORDER BY 1 LIMIT 1
+            """, {'id': id}).fetchone()[0]
+
+            if id not in self._index:
+                return id
+
+            id += 1
+
+    def overdue(self, date):
+        day = date.toordinal()
+
+        def match(t):
+            return t.due_ordinal is not None and t.due_ordinal <= day and \
+                not t.completed
+
+        return self._query(
+            'WHERE due IS NOT NULL AND completed = 0 AND due <= ?',
+            (date.isoformat(),), match=match)
+
+    def next_due(self, date):
+        day = date.toordinal()
+
+        if self.dirty:
+            # building the tasks is only worth it to see unsaved changes
+            found = self._query(
+                'WHERE completed = 0 AND due > ?', (date.isoformat(),),
+                order='due', key=_due_field,
+                match=lambda t: _due_field(t) > day and not t.completed)
+            return found[0].due if found else None
+
+        if self._db is None:
+            return None
+
+        row = self._db.execute(
+            'SELECT MIN(due) FROM tasks WHERE completed = 0 AND due > ?',
+            (date.isoformat(),)).fetchone()
+        return None if row[0] is None else datetime.date.fromisoformat(row[0])
+
+    def select(self, completed=False, recurring_before=None,
+               no_recurring=False, search=(), match_all=False):
+        where = ['completed = ?']
+        params = [int(completed)]
+
+        if recurring_before is not None:
+            where.append('(recurs = 0 OR due < ?)')
+            params.append(recurring_before.isoformat())
+
+        if no_recurring:
+            where.append('schedule IS NULL')
+
+        if len(search) > 0:
+            joiner = ' AND ' if match_all else ' OR '
+            where.append('(' + joiner.join(
+                "name LIKE ? ESCAPE '\\'" for _ in search) + ')')
+            params.extend('%' + term.replace('\\', '\\\\')
+                          .replace('%', '\\%').replace('_', '\\_') + '%'
+                          for term in search)
+
+        terms = [term.lower() for term in search]
+        test = all if match_all else any
+
+        def match(t):
+            if t.completed != completed or \
+                    no_recurring and t.schedule is not None:
+                return False
+            if recurring_before is not None and t.recurs and (
+                    t.due is None or t.due >= recurring_before):
+                return False
+            return not terms or test(term in t.name.lower()
+                                     for term in terms)
+
+        def key(t):
+            # undated tasks first, then latest due date first, then by id
+            return t.due is not None, -_due_field(t), _id_field(t)
+
+        return self._query('WHERE ' + ' AND '.join(where), params,
+                           order='due IS NULL DESC, due DESC, id',
+                           match=match, key=key)
+
+    def remove_completed(self):
+        self._load_all()
+        return super().remove_completed()
+
+    def reorder(self):
+        self._load_all()
+        super().reorder()
+
+    @staticmethod
+    def _row(t):
+        due = t.due.isoformat() if t.due is not None else None
+        return (t.id, t.name, due, t.schedule, int(t.completed),
+                int(t.recurs))
+
+    def save(self, path):
+        db = self._connect(path)
+        renumbered = any(t.id != old_id
+                         for t, old_id, _ in self._changed.values())
+
+        with db:
+            if renumbered:
+                db.execute('DELETE FROM tasks')
+                changed = [t for t in self.items if id(t) not in self._added]
+            else:
+                db.executemany('DELETE FROM tasks WHERE id = ?',
+                               [(id,) for id in self._removed])
+                changed = [t for t, _, _ in self._changed.values()]
+
+            db.executemany(
+                f'INSERT OR REPLACE INTO tasks ({self.fields}) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                [self._row(t) for t in changed])
+
+            for t in self._added.values():
+                if t.id is None:
+                    t.id = self.find_unused_id()
+                db.execute(f'INSERT INTO tasks ({self.fields}) '
+                           'VALUES (?, ?, ?, ?, ?, ?)', self._row(t))
+
+        self._stored = {t.id: t for t in self.items}
+        self._after_save(path)
+
+
+def migrate(json_path, db):
+    """Copy the tasks in a JSON data file into an SQLite database."""
+    tasks = models.TaskCollection()
+    tasks.load(json_path)
+    tasks.assign_ids()
+
+    with db:
+        db.executemany(
+            f'INSERT OR REPLACE INTO tasks ({SQLiteTaskCollection.fields}) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            [SQLiteTaskCollection._row(t) for t in tasks])
+
+
+class _LazyTasks(collections.abc.Sequence):
+    # tasks picked out of a RecordTaskCollection, each one either a slot
+    # (built into a task when it is first accessed) or a task
+    def __init__(self, collection, entries):
+        self._collection = collection
+        self._entries = entries
+
+    def _get(self, entry):
+        if isinstance(entry, models.Task):
+            return entry
+        return self._collection._task(entry)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return map(self._get, self._entries)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self._get(e) for e in self._entries[idx]]
+        return self._get(self._entries[idx])
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+
+class RecordTaskCollection(models.TaskCollection):
+    """Task collection stored as fixed-size records read through mmap (see
+    recordfile.py).
+
+    As with SQLiteTaskCollection, tasks are only built for the records a
+    command asks for: find_by_id reads the one record for the id, `list` and
+    `status` filter the id, due date and flag fields of the mapped file
+    without reading any names, and saving rewrites just the records of the
+    tasks that changed. The record file is created from the JSON data file
+    the first time it is used.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._file = None
+        self._complete = False
+
+    @staticmethod
+    def record_path(path):
+        return os.path.splitext(path)[0] + '.rec'
+
+    @staticmethod
+    def heap_path(path):
+        return os.path.splitext(path)[0] + '.heap'
+
+    @classmethod
+    def exists(cls, path):
+        return os.path.exists(path) or os.path.exists(cls.record_path(path))
+
+    @classmethod
+    def files(cls, path):
+        return [cls.record_path(path), cls.heap_path(path)]
+
+    def _open(self, path, locked=False):
+        # locked is true when the caller already holds the lock on path,
+        # which taking again on another descriptor would wait for forever
+        if self._file is not None:
+            return self._file
+
+        record_path = self.record_path(path)
+        if not os.path.exists(record_path):
+            tasks = models.TaskCollection()
+            if os.path.exists(path):
+                tasks.load(path)
+                tasks.assign_ids()
+
+            with contextlib.nullcontext() if locked else fsutil.locked(path):
+                if not os.path.exists(record_path):
+                    recordfile.create(record_path, self.heap_path(path),
+                                      [t.to_row() for t in tasks])
+
+        self._file = recordfile.RecordFile(record_path,
+                                           self.heap_path(path))
+        return self._file
+
+    def load(self, path, keep=None):
+        # records are only read as they are asked for anyway
+        self._open(path)
+        self._mark_clean()
+
+    def _task(self, slot):
+        # reuse tasks that have already been built so changes to them are
+        # tracked in one place
+        t = self._index.get(slot)
+        if t is not None:
+            return t
+
+        t = models.Task.from_row(self._file.row(slot))
+        self.items.append(t)
+        self._index[t.id] = t
+        t._collection = self
+        return t
+
+    def _select(self, mask, match, order):
+        """Return entries for the slots whose id, due and flags fields mask
+        picks out, along with the unsaved tasks for which match is true,
+        ordered by order (which takes those same fields and returns a tuple
+        of keys)."""
+        tasks, stale = _unsaved(self)
+        tasks = [t for t in tasks if match(t)]
+
+        if self._file is None:
+            return sorted(tasks, key=lambda t: order(
+                _id_field(t), _due_field(t), _flags_field(t)))
+
+        ids, due, flags = self._file.fields()
+
+        # NumPy arrays if fields picked NumPy for this many
+        numpy = columns.load_numpy(len(ids))
+        if numpy is not None:
+            rows = numpy.flatnonzero(mask(ids, due, flags))
+            rows = rows[numpy.lexsort(
+                order(rows, due[rows], flags[rows])[::-1])].tolist()
+        else:
+            rows = [i for i in range(len(ids))
+                    if mask(ids[i], due[i], flags[i])]
+            rows.sort(key=lambda i: order(i, due[i], flags[i]))
+
+        rows = [i for i in rows if i not in stale]
+        if not tasks:
+            return rows
+
+        def _key(entry):
+            if isinstance(entry, models.Task):
+                return order(_id_field(entry), _due_field(entry),
+                             _flags_field(entry))
+            return order(entry, int(due[entry]), int(flags[entry]))
+
+        return sorted(rows + tasks, key=_key)
+
+    def _load_all(self):
+        if self._complete:
+            return
+
+        if self._file is not None:
+            _, stale = _unsaved(self)
+            ids = self._file.fields()[0]
+            for slot in range(len(ids)):
+                if ids[slot] != recordfile.FREE and slot not in stale:
+                    self._task(slot)
+
+        self._complete = True
+
+    @property
+    def fully_loaded(self):
+        return self._complete
+
+    def __iter__(self):
+        self._load_all()
+        return super().__iter__()
+
+    def __getitem__(self, idx):
+        self._load_all()
+        return super().__getitem__(idx)
+
+    def __len__(self):
+        self._load_all()
+        return super().__len__()
+
+    def find_by_id(self, id):
+        if type(id) == str:
+            id = int(id, 36)
+
+        if id in self._index or id in self._removed or self._complete \
+                or self._file is None or not self._file.occupied(id):
+            return self._index.get(id)
+
+        return self._task(id)
+
+    def find_unused_id(self):
+        if self._file is None:
+            return super().find_unused_id()
+
+        # the smallest free slot (or slot about to be freed) that no task
+        # in memory has been given
+        ids = self._file.fields()[0]
+        numpy = columns.load_numpy(len(ids))
+        if numpy is not None:
+            free = numpy.flatnonzero(ids == recordfile.FREE)
+            free = free.tolist()
+        else:
+            free = [i for i in range(len(ids)) if ids[i] == recordfile.FREE]
+        free = sorted(set(self._removed).union(free))
+
+        for id in free:
+            if id not in self._index:
+                return id
+
+        id = len(ids)
+        while id in self._index:
+            id += 1
+        return id
+
+    def overdue(self, date):
+        day = date.toordinal()
+
+        def mask(ids, due, flags):
+            return (ids != recordfile.FREE) & (due != 0) & (due <= day) & \
+                (flags & columns.COMPLETED == 0)
+
+        def match(t):
+            return t.due_ordinal is not None and t.due_ordinal <= day and \
+                not t.completed
+
+        entries = self._select(mask, match, lambda id, due, flags: (id,))
+        return _LazyTasks(self, entries)[:]
+
+    def next_due(self, date):
+        day = date.toordinal()
+
+        def mask(ids, due, flags):
+            return (ids != recordfile.FREE) & (due > day) & \
+                (flags & columns.COMPLETED == 0)
+
+        def match(t):
+            return t.due_ordinal is not None and t.due_ordinal > day and \
+                not t.completed
+
+        entries = self._select(mask, match, lambda id, due, flags: (due,))
+        if not entries:
+            return None
+
+        first = entries[0]
+        if isinstance(first, models.Task):
+            return first.due
+        return datetime.date.fromordinal(int(self._file.record(first)[1]))
+
+    def select(self, completed=False, recurring_before=None,
+               no_recurring=False, search=(), match_all=False):
+        completed = columns.COMPLETED if completed else 0
+        before = None if recurring_before is None \
+            else recurring_before.toordinal()
+
+        def wanted(due, flags):
+            picked = flags & columns.COMPLETED == completed
+            if before is not None:
+                picked = picked & ((flags & columns.RECURS == 0) |
+                                   ((due != 0) & (due < before)))
+            if no_recurring:
+                picked = picked & (flags & columns.SCHEDULED == 0)
+            return picked
+
+        def mask(ids, due, flags):
+            return (ids != recordfile.FREE) & wanted(due, flags)
+
+        def match(t):
+            # unsaved tasks may have no id yet, which is not a free slot
+            return bool(wanted(_due_field(t), _flags_field(t)))
+
+        def order(id, due, flags):
+            # latest due date first, with undated tasks before any, then by
+            # id
+            if not isinstance(due, int):
+                due = columns.numpy.where(due == 0, columns.NO_DUE, due)
+            elif due == 0:
+                due = columns.NO_DUE
+            return -due, id
+
+        entries = self._select(mask, match, order)
+
+        if len(search) > 0:
+            terms = [term.lower() for term in search]
+            test = all if match_all else any
+
+            def name(entry):
+                if isinstance(entry, models.Task):
+                    return entry.name.lower()
+                return self._file.name(entry).lower()
+
+            entries = [e for e in entries
+                       if test(term in name(e) for term in terms)]
+
+        return _LazyTasks(self, entries)
+
+    def remove_completed(self):
+        self._load_all()
+        return super().remove_completed()
+
+    def reorder(self):
+        # by id, as tasks are only in the order they happened to be built
+        self._load_all()
+        self.items.sort(key=_id_field)
+        super().reorder()
+
+    def save(self, path):
+        with profiling.phase('save'), fsutil.locked(path):
+            file = self._open(path, locked=True)
+            file.refresh()
+
+            renumbered = self._reordered or any(
+                t.id != old_id for t, old_id, _ in self._changed.values())
+
+            if renumbered:
+                self._rewrite(file)
+            else:
+                file.free(self._removed)
+
+                # another process may have taken the id since
+                for t in self._added.values():
+                    if t.id is None or file.occupied(t.id):
+                        t.id = None
+                        t.id = self.find_unused_id()
+
+                changed = [t for t, _, _ in self._changed.values()]
+                changed.extend(self._added.values())
+                file.put([t.to_row() for t in changed])
+
+        with profiling.phase('caches'):
+            self._after_save(path)
+
+    def _rewrite(self, file):
+        # write every task out again under its new id, keeping what other
+        # processes have saved since: changes to (and removals of) tasks
+        # that were only renumbered here, and tasks they added (which go at
+        # the end)
+        self._load_all()
+        known = set(self._removed)
+        rows = []
+        gone = []
+
+        # tasks added since the reorder still need ids, after the others
+        next_id = max((t.id for t in self.items if t.id is not None),
+                      default=-1) + 1
+        for t in self._added.values():
+            if t.id is None:
+                t.id = next_id
+                next_id += 1
+
+        for t in list(self.items):
+            change = self._changed.get(id(t))
+            old_id = t.id if change is None else change[1]
+            known.add(old_id)
+
+            # tasks added here have no record of their own to keep
+            row = t.to_row()
+            if id(t) not in self._added and old_id is not None and \
+                    (change is None or change[2] <= {'id'}):
+                if not file.occupied(old_id):
+                    gone.append(t)
+                    continue
+                row = (t.id,) + file.row(old_id)[1:]
+                _, t.name, due, t.schedule, t.completed, t.recurs = row
+                t.due = None if due is None else datetime.date.fromordinal(due)
+            rows.append(row)
+        self.remove_many(gone)
+
+        next_id = max((t.id for t in self.items), default=-1) + 1
+        ids = file.fields()[0]
+        for slot in range(len(ids)):
+            if ids[slot] != recordfile.FREE and slot not in known:
+                row = (next_id,) + file.row(slot)[1:]
+                self.add(models.Task.from_row(row))
+                rows.append(row)
+                next_id += 1
+
+        recordfile.create(file.path, file.heap_path, rows)
+        file.refresh()
+
+
+def _unsaved(collection):
+    # tasks whose records or rows (if any) no longer say what they hold, and
+    # the ids those are stored under, which queries take from memory instead
+    tasks = [t for t, _, _ in collection._changed.values()]
+    tasks.extend(collection._added.values())
+
+    stale = set(collection._removed)
+    stale.update(old_id for _, old_id, _ in collection._changed.values())
+    stale.update(t.id for t in tasks if t.id is not None)
+    return tasks, stale
+
+
+def _id_field(t):
+    return -1 if t.id is None else t.id
+
+
+def _due_field(t):
+    return t.due_ordinal or 0
+
+
+def _flags_field(t):
+    return (columns.COMPLETED if t.completed else 0) | \
+        (columns.RECURS if t.recurs else 0) | \
+        (columns.SCHEDULED if t.schedule is not None else 0)
+
+
+backends = {
+    'json': models.TaskCollection,
+    'journal': JournalTaskCollection,
+    'sqlite': SQLiteTaskCollection,
+    'records': RecordTaskCollection,
+}
+
+
+def open_collection(path, backend=None, keep=None):
+    """Create a task collection for the configured backend, loading path if
+    it exists (see TaskCollection.load for keep)."""
+    cls = backends[backend or settings.storage_backend]
+    collection = cls()
+
+    if cls.exists(path):
+        collection.load(path, keep)
+    else:
+        collection._stamp = fsutil.stamp(cls.files(path))
+
+    return collection
+
+
+def data_files(path, backend=None):
+    """Return the files holding the tasks stored at path."""
+    return backends[backend or settings.storage_backend].files(path)
+
+
+# the list kept in settings.data_file; the others are in files next to it
+DEFAULT_LIST = 'default'
+
+
+def list_path(name):
+    """Return the data file of the task list called name."""
+    if name == DEFAULT_LIST:
+        return settings.data_file
+
+    base, ext = os.path.splitext(settings.data_file)
+    return f'{base}-{name}{ext}'
+
+
+def list_names(backend=None):
+    """Return the names of the task lists that have been saved, the default
+    list (whether saved or not) first."""
+    prefix, suffix = data_files(list_path('*'), backend)[0].rsplit('*', 1)
+    found = glob.glob(glob.escape(prefix) + '*' + glob.escape(suffix))
+    names = sorted(f[len(prefix):len(f) - len(suffix)] for f in found)
+
+    return [DEFAULT_LIST] + [n for n in names if n != DEFAULT_LIST]
+
+
+def data_stamp(path, backend=None):
+    """Return a value that changes whenever the files holding the tasks
+    stored at path change."""
+    return fsutil.stamp(data_files(path, backend))
+
+
+class LazyTaskCollection:
+    """Stand-in for a task collection that only loads the data file the
+    first time the tasks are actually used."""
+
+    def __init__(self, path, backend=None, keep=None):
+        self.path = path
+        self.backend = backend
+        self.keep = keep
+        self._loaded = None
+        self._checkpoint = False
+
+    @property
+    def loaded(self):
+        return self._loaded is not None
+
+    @property
+    def collection(self):
+        if self._loaded is None:
+            self._loaded = open_collection(self.path, self.backend,
+                                           self.keep)
+            if self._checkpoint:
+                self._loaded.checkpoint()
+
+        return self._loaded
+
+    def checkpoint(self):
+        # without loading: a collection loaded later has nothing to undo
+        # from before then
+        if self._loaded is None:
+            self._checkpoint = True
+        else:
+            self._loaded.checkpoint()
+
+    def rollback(self):
+        if self._loaded is not None:
+            self._loaded.rollback()
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    def __iter__(self):
+        return iter(self.collection)
+
+    def __getitem__(self, idx):
+        return self.collection[idx]
+
+    def __len__(self):
+        return len(self.collection)
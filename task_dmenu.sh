@@ -1,4 +1,29 @@
-_tasks=$(~/src/pytasks/venv/bin/python ~/src/pytasks/completion.py dmenu)
+_cached() {
+    # print a cache written by pytasks, if it still matches the data files
+    local data=${XDG_DATA_HOME:+$XDG_DATA_HOME/tasks.json}
+    local cache=${data:-$HOME/.tasks.json}.$1 tag ino mtime size file
+    [[ -r $cache ]] || return 1
+    while read -r tag ino mtime size file; do
+        [[ $tag == '#' ]] || break
+        if [[ $ino == - ]]; then
+            [[ ! -e "$file" ]] || return 1
+        else
+            [[ $(stat -c '%i %.9Y %s' "$file" 2>/dev/null) \
+                == "$ino $mtime $size" ]] || return 1
+        fi
+    done < "$cache"
+    grep -v '^# ' "$cache"
+}
+
+_sock="${XDG_RUNTIME_DIR:-/tmp}/pytasks-$(id -u).sock"
+if _tasks=$(_cached dmenu); then
+    :
+elif [[ -S $_sock ]] && command -v socat > /dev/null \
+        && _tasks=$(echo dmenu | socat - "UNIX-CONNECT:$_sock" 2> /dev/null); then
+    :
+else
+    _tasks=$(~/src/pytasks/venv/bin/python ~/src/pytasks/fast.py dmenu)
+fi
 _opts=('-i' '-l' '5' '-fn' 'Noto Sans UI Regular:pixelsize=14' '-p' 'Complete task:')
 _task=$(printf '%s\n' "${_tasks[@]}" | dmenu "${_opts[@]}" | cut -d" " -f1 | tr -d "[]")
 if [[ $? == 0 ]]; then
@@ -1,20 +1,86 @@
+# first, so that the time spent importing everything else is measured
+import profiling
+
 import datetime
-from os import path
+import heapq
+import json
+import re
+import shlex
 
 import click
 
+import archive
+import caches
+import columns
 import models
 import settings
+import storage
+
+
+profiling.mark('import')
+
+# the task list commands work on, chosen with --list
+list_name = storage.DEFAULT_LIST
+data_file = settings.data_file
+
+# completed tasks are only built when a command asks for them
+tasks = storage.LazyTaskCollection(data_file, keep=models.incomplete)
+
+# set while running `batch`, which saves once after all of its commands
+_batching = False
+
+# set by --all-lists, for `list` and `status`
+_all_lists = False
+
 
+def save():
+    if _batching:
+        # later commands in the batch may refer to new tasks by id
+        tasks.assign_ids()
+    else:
+        tasks.save(data_file)
 
-tasks = models.TaskCollection()
-if path.exists(settings.data_file):
-    tasks.load(settings.data_file)
+
+def _use_list(name):
+    global list_name, data_file, tasks
+
+    if name == list_name:
+        return
+
+    if not re.fullmatch(r'[\w-]+', name):
+        raise click.BadParameter('must be letters, digits, _ and -',
+                                 param_hint="'--list'")
+    if _batching:
+        raise click.ClickException(
+            'every command in a batch must use the same list')
+
+    list_name = name
+    data_file = storage.list_path(name)
+    tasks = storage.LazyTaskCollection(data_file, keep=models.incomplete)
 
 
 @click.group()
-def cli():
-    pass
+@click.option('--profile', is_flag=True,
+              help='Report where the time goes on stderr.')
+@click.option('-L', '--list', 'list_', metavar='NAME',
+              help='Use the task list called NAME.')
+@click.option('--all-lists', is_flag=True,
+              help='Show the tasks on every list (list and status only).')
+@click.pass_context
+def cli(ctx, profile, list_, all_lists):
+    global _all_lists
+
+    if profile:
+        profiling.start()
+
+    if all_lists and (list_ is not None or
+                      ctx.invoked_subcommand not in ('list', 'status')):
+        raise click.UsageError(
+            '--all-lists only goes with list and status, without --list')
+    _all_lists = all_lists
+
+    if list_ is not None:
+        _use_list(list_)
 
 
 @cli.command()
@@ -35,19 +101,112 @@ def add(name, due, recurs):
         t.schedule = recurs
 
     tasks.add(t)
-    tasks.save(settings.data_file)
+    save()
     click.echo(f'Added task {t.name} (id {t.display_id}).')
 
 
+def _batch_args(line):
+    line = line.strip()
+
+    if line.startswith('['):
+        args = json.loads(line)
+        if not all(type(a) == str for a in args):
+            raise click.ClickException('expected a JSON array of strings')
+        return args
+
+    return shlex.split(line, comments=True)
+
+
+@cli.command()
+@click.argument('input', type=click.File('r'), default='-')
+@click.option('-a', '--atomic', is_flag=True,
+              help="Don't save anything if any command fails.")
+@click.pass_context
+def batch(ctx, input, atomic):
+    """Run several commands, loading and saving tasks once.
+
+    Commands are read from INPUT (or stdin), one per line, either written as
+    on the command line or as a JSON array of arguments. A line that fails
+    changes nothing."""
+    global _batching
+
+    if _batching:
+        raise click.ClickException('batches cannot be nested')
+
+    failed = 0
+    _batching = True
+
+    try:
+        for n, line in enumerate(input, 1):
+            tasks.checkpoint()
+
+            try:
+                args = _batch_args(line)
+                if len(args) == 0:
+                    continue
+
+                cli.main(args, prog_name='task', standalone_mode=False)
+            except click.exceptions.Exit:
+                pass
+            except Exception as e:
+                # undo whatever the command got done before failing
+                tasks.rollback()
+                failed += 1
+                click.echo(f'line {n}: failed: {e}', err=True)
+                continue
+
+            click.echo(f'line {n}: ok', err=True)
+    finally:
+        _batching = False
+
+    if failed and atomic:
+        click.echo(f'{failed} commands failed, nothing saved.', err=True)
+        ctx.exit(1)
+
+    if tasks.loaded and tasks.dirty:
+        save()
+
+    if failed:
+        ctx.exit(1)
+
+
+def _archiving():
+    # the other backends only read the tasks they need anyway
+    return settings.archive_completed and \
+        settings.storage_backend in ('json', 'journal')
+
+
+def _archived(path):
+    # archived tasks as a collection of their own, without ids since those
+    # have been handed out again since
+    collection = models.TaskCollection()
+
+    for record in archive.records(path):
+        record['id'] = None
+        collection.add(models.Task.from_record(record))
+
+    return collection
+
+
+def _due_key(t):
+    return columns.NO_DUE if t.due_ordinal is None else t.due_ordinal
+
+
 @cli.command(name='clean-cache')
 def clean_cache():
     """Remove all completed tasks."""
-    starting = len(tasks)
-    tasks.items = list(filter(lambda t: not t.completed, tasks))
-    ending = len(tasks)
-    tasks.save(settings.data_file)
+    if not _archiving():
+        cleared = tasks.remove_completed()
+        save()
+        click.echo(f'Cleared {cleared} tasks.')
+        return
 
-    click.echo(f'Cleared {starting-ending} tasks.')
+    # saving archives them, old ones are dropped from the archive
+    archived = len(tasks.select(completed=True))
+    save()
+    expired = archive.compact(data_file, datetime.date.today(),
+                              settings.archive_retention_days)
+    click.echo(f'Archived {archived} tasks, expired {expired}.')
 
 
 @cli.command()
@@ -59,19 +218,19 @@ def complete(ids):
         t.complete()
         click.echo(f'Task {t.display_id} ({t.name}) completed.')
 
-    tasks.save(settings.data_file)
+    save()
 
 
 @cli.command()
 @click.argument('ids', nargs=-1)
 def delete(ids):
     """Delete a task."""
-    for id in ids:
-        t = tasks.find_by_id(id)
-        tasks.remove(t)
+    removing = [tasks.find_by_id(id) for id in ids]
+    for t in removing:
         click.echo(f'Task {t.display_id} ({t.name}) deleted.')
+    tasks.remove_many(removing)
 
-    tasks.save(settings.data_file)
+    save()
 
 
 @cli.command(name='list')
@@ -84,39 +243,79 @@ def delete(ids):
               help="Show all tasks (don't limit to next six months).")
 @click.option('-s', '--show-schedule', is_flag=True,
               help='Show schedule of recurring tasks.')
-def list_tasks(search, no_recurring, completed, all, show_schedule):
+@click.option('-m', '--match-all', is_flag=True,
+              help='Only show tasks matching every search term.')
+@click.option('-l', '--limit', type=int,
+              help='Show at most this many tasks.')
+@click.option('-o', '--offset', type=int, default=0,
+              help='Skip this many tasks before showing any.')
+@click.option('-p', '--pager', is_flag=True,
+              help='Page through the list.')
+def list_tasks(search, no_recurring, completed, all, show_schedule,
+               match_all, limit, offset, pager):
     """List (or optionally search) tasks."""
-    selected = list(tasks)
-
+    before = None
     if not all:
-        limit = datetime.date.today() + datetime.timedelta(days=180)
-        selected = filter(lambda t: not t.recurs or t.recurs and t.due < limit,
-                          selected)
-
-    if no_recurring:
-        selected = filter(lambda t: t.schedule is None, selected)
-
-    selected = filter(lambda t: t.completed == completed, selected)
-
-    if len(search) > 0:
-        new_tasks = []
+        before = datetime.date.today() + datetime.timedelta(days=180)
+
+    def select(collection, path):
+        selected = collection.select(
+            completed=completed, recurring_before=before,
+            no_recurring=no_recurring, search=search, match_all=match_all)
+
+        if completed and _archiving():
+            archived = _archived(path).select(
+                completed=True, recurring_before=before,
+                no_recurring=no_recurring, search=search,
+                match_all=match_all)
+            selected = list(heapq.merge(selected, archived, key=_due_key,
+                                        reverse=True))
+
+        return selected
+
+    lists = None
+    with profiling.phase('select'):
+        if _all_lists:
+            names = storage.list_names()
+            results = _each_list(names, select)
+            lists = {id(t): name for name, selected in zip(names, results)
+                     for t in selected}
+            # each is in order already
+            selected = list(heapq.merge(*results, key=_due_key,
+                                        reverse=True))
+        else:
+            selected = select(tasks, data_file)
+
+    end = None if limit is None else offset + limit
+    display = models.TaskListDisplay(selected[offset:end])
+    display.show_schedule = show_schedule
+    display.total = len(selected)
+    display.lists = lists
 
-        for term in search:
-            def _search_filter(t):
-                return term.lower() in t.name.lower()
+    if pager:
+        click.echo_via_pager(f'{line}\n' for line in display.lines())
+        return
 
-            new_tasks.extend(filter(_search_filter, selected))
+    with profiling.phase('render'):
+        for chunk in display.chunks():
+            click.echo(chunk)
 
-        selected = new_tasks
 
-    def _date_sort(t):
-        return datetime.date.max if t.due is None else t.due
+@cli.command()
+@click.option('-w', '--weeks', type=int, default=4,
+              help='Number of weeks to show (default 4).')
+def agenda(weeks):
+    """List what falls due over the next few weeks."""
+    today = datetime.date.today()
+    end = today + datetime.timedelta(weeks=weeks)
+    day = None
 
-    selected = sorted(selected, key=_date_sort, reverse=True)
+    for date, t in tasks.agenda(end, start=today):
+        if date != day:
+            day = date
+            click.echo(date.strftime(models.TaskListDisplay.date_format))
 
-    display = models.TaskListDisplay(selected)
-    display.show_schedule = show_schedule
-    click.echo(display.output())
+        click.echo(f'  [{t.display_id}] {t.name}')
 
 
 @cli.command()
@@ -130,7 +329,7 @@ def postpone(date, ids):
         to_date = t.due.strftime('%A, %B %d %Y')
         click.echo(f'Changed due date of task "{t.name}" to {to_date}.')
 
-    tasks.save(settings.data_file)
+    save()
 
 
 @cli.command()
@@ -143,7 +342,7 @@ def reschedule(schedule, ids):
         t.schedule = schedule
         click.echo(f'Changed schedule of task "{t.name}" to {schedule}.')
 
-    tasks.save(settings.data_file)
+    save()
 
 
 @cli.command()
@@ -155,27 +354,66 @@ def rename(id, name):
     old_name = t.name
     t.name = name
     click.echo(f'Renamed task "{old_name}" to "{t.name}".')
-    tasks.save(settings.data_file)
+    save()
 
 
 @cli.command()
 def reorder():
     """Reset task ids."""
-    for i, t in enumerate(tasks):
-        t.id = i
+    tasks.reorder()
+    save()
+
+
+def _each_list(names, fn):
+    # run fn(collection, path) for every list named, on threads of its own so
+    # that reading the files overlaps; the list in use keeps its collection,
+    # which a batch may have changed
+    import concurrent.futures  # only needed with --all-lists
 
-    tasks.save(settings.data_file)
+    def run(name):
+        if name == list_name:
+            return fn(tasks, data_file)
+
+        path = storage.list_path(name)
+        return fn(storage.LazyTaskCollection(path, keep=models.incomplete),
+                  path)
+
+    with concurrent.futures.ThreadPoolExecutor(len(names)) as pool:
+        return list(pool.map(run, names))
+
+
+def _status_line(collection, path, today):
+    # the cache describes the saved tasks, which a batch may have changed
+    if settings.status_cache and not (collection.loaded and
+                                      collection.dirty):
+        files = storage.data_files(path)
+        with profiling.phase('status cache'):
+            status = caches.read_status_cache(path, files, today)
+
+        if status is None:
+            with profiling.phase('overdue'):
+                status = caches.write_status_cache(collection, path, today)
+    else:
+        with profiling.phase('overdue'):
+            status = caches.status_line(collection.overdue(today))
+
+    return status
 
 
 @cli.command()
 def status():
     """Statusbar-friendly output of (over)due tasks."""
     today = datetime.date.today()
-    due = sorted(
-        filter(lambda t: t.due and not t.completed and t.due <= today, tasks),
-        key=lambda t: t.id
-    )
-    status = ' '.join(f'[{t.display_id}] {t.name}' for t in due)
+
+    if _all_lists:
+        names = storage.list_names()
+        lines = _each_list(
+            names, lambda collection, path: _status_line(collection, path,
+                                                         today))
+        status = ' '.join(f'{name}: {line}'
+                          for name, line in zip(names, lines) if line != '')
+    else:
+        status = _status_line(tasks, data_file, today)
 
     if status != '':
         click.echo(status)
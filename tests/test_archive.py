@@ -0,0 +1,53 @@
+import datetime
+import json
+import os
+
+import archive
+import models
+import settings
+import storage
+
+
+def test_archive_segments(tmpdir, monkeypatch):
+    path = str(tmpdir.join('tasks.json'))
+    monkeypatch.setattr(settings, 'archive_segment_size', 2)
+    day = datetime.date(2017, 1, 3)
+
+    assert archive.segments(path) == []
+    assert list(archive.records(path)) == []
+
+    archive.append(path, [{'id': 1, 'name': 'a'}], day)
+    archive.append(path, [{'id': 2, 'name': 'b'}, {'id': 3, 'name': 'c'}],
+                   day + datetime.timedelta(days=10))
+    assert len(archive.segments(path)) == 2
+    assert [(r['name'], r['archived']) for r in archive.records(path)] == [
+        ('a', '2017-01-03'), ('b', '2017-01-13'), ('c', '2017-01-13')]
+
+    # compaction drops what is past retention and packs the rest
+    assert archive.compact(path, day + datetime.timedelta(days=12)) == 0
+    assert archive.compact(path, day + datetime.timedelta(days=12), 5) == 1
+    assert [r['name'] for r in archive.records(path)] == ['b', 'c']
+    assert len(archive.segments(path)) == 1
+    assert archive.compact(path, day + datetime.timedelta(days=30), 5) == 2
+    assert archive.segments(path) == []
+
+
+def test_archive_completed(task_collection, tmpdir, monkeypatch):
+    path = str(tmpdir.join('tasks.json'))
+    monkeypatch.setattr(settings, 'archive_completed', True)
+
+    # saving moves completed tasks out of the data file
+    task_collection.save(path)
+    with open(path) as f:
+        assert [t['id'] for t in json.load(f)] == [0, 3]
+    assert [r['name'] for r in archive.records(path)] == ['completed task']
+
+    # with the journal backend too, including tasks skipped on load
+    collection = storage.open_collection(path, 'journal',
+                                         keep=models.incomplete)
+    collection.find_by_id(0).complete()
+    collection.save(path)
+    assert os.path.exists(storage.JournalTaskCollection.journal_path(path))
+    assert [t.id for t in storage.open_collection(path, 'journal')] == [3]
+    assert [r['name'] for r in archive.records(path)] == [
+        'completed task', 'incomplete task']
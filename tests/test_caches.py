@@ -0,0 +1,78 @@
+import os
+import shutil
+import subprocess
+
+import pytest
+
+import caches
+
+
+def test_completion_caches(task_collection, tmpdir):
+    path = str(tmpdir.join('tasks.json'))
+    task_collection.save(path)
+
+    # caches are written on save
+    assert caches.read_cache(path, 'ids', [path]) == [
+        '0:incomplete task', '1:completed task', '3:weekly recurring task']
+    assert caches.read_cache(path, 'dmenu', [path]) == [
+        '[0] incomplete task', '[3] weekly recurring task']
+
+    # and are stale as soon as the data file changes behind our back
+    with open(path, 'a') as f:
+        f.write(' ')
+    assert caches.read_cache(path, 'ids', [path]) is None
+
+    # even by an edit that keeps the size, within the same second
+    task_collection.save(path)
+    with open(path, 'r+') as f:
+        data = f.read().replace('incomplete', 'unfinished')
+        f.seek(0)
+        f.write(data)
+    assert caches.read_cache(path, 'ids', [path]) is None
+
+    # or when they describe different files
+    task_collection.save(path)
+    assert caches.read_cache(path, 'ids', [path]) is not None
+    assert caches.read_cache(path, 'ids', [path, path + '.journal']) is None
+
+    # missing caches are just missing
+    caches.remove_caches(path)
+    assert not os.path.exists(caches.cache_path(path, 'dmenu'))
+    assert caches.read_cache(path, 'dmenu', [path]) is None
+
+
+def test_status_cache(task_collection, jan_3_2017, tmpdir):
+    path = str(tmpdir.join('tasks.json'))
+    task_collection.save(path)
+
+    line = caches.write_status_cache(task_collection, path, jan_3_2017)
+    assert line == '[3] weekly recurring task'
+    assert caches.read_status_cache(path, [path], jan_3_2017) == line
+
+    # nothing else falls due until the end of the year
+    day = jan_3_2017.replace(month=12, day=30)
+    assert caches.read_status_cache(path, [path], day) == line
+    day = jan_3_2017.replace(month=12, day=31)
+    assert caches.read_status_cache(path, [path], day) is None
+    assert caches.read_status_cache(path, [path], jan_3_2017.replace(day=2)) \
+        is None
+
+    # the cache is stale once the data file changes
+    task_collection.find_by_id(3).complete()
+    task_collection.save(path)
+    assert caches.read_status_cache(path, [path], jan_3_2017) is None
+    assert caches.write_status_cache(task_collection, path, jan_3_2017) == ''
+    assert caches.read_status_cache(path, [path], jan_3_2017) == ''
+
+
+@pytest.mark.skipif(shutil.which('stat') is None, reason='needs stat')
+def test_cache_header_shell(task_collection, tmpdir):
+    path = str(tmpdir.join('tasks.json'))
+    task_collection.save(path)
+
+    # the scripts check headers against what stat prints for the file
+    with open(caches.cache_path(path, 'dmenu')) as f:
+        header = f.readline().split()
+    result = subprocess.run(['stat', '-c', '%i %.9Y %s', path],
+                            capture_output=True, text=True, check=True)
+    assert header == ['#'] + result.stdout.split() + [path]
@@ -0,0 +1,66 @@
+import datetime
+
+import pytest
+
+import columns
+
+
+@pytest.fixture(params=['numpy', 'array'])
+def backend(request, monkeypatch):
+    if request.param == 'numpy':
+        monkeypatch.setattr(columns, 'numpy', pytest.importorskip('numpy'))
+    else:
+        monkeypatch.setattr(columns, 'numpy', None)
+
+    yield request.param
+
+
+def test_task_columns(backend, task_collection, incomplete_task,
+                      completed_task, weekly_recurring_task,
+                      task_not_in_collection):
+    tasks = list(task_collection) + [task_not_in_collection]
+    cols = columns.TaskColumns(tasks)
+    assert len(cols) == 4
+
+    assert cols.overdue(datetime.date(2017, 1, 2)) == []
+    assert cols.overdue(datetime.date(2017, 1, 3)) == [weekly_recurring_task]
+    assert cols.overdue(datetime.date(2018, 1, 1)) == [incomplete_task,
+                                                       weekly_recurring_task]
+
+    # undated tasks first, then latest due date first
+    assert cols.select() == [task_not_in_collection, incomplete_task,
+                             weekly_recurring_task]
+    assert cols.select(completed=True) == [completed_task]
+    assert cols.select(no_recurring=True) == [task_not_in_collection,
+                                              incomplete_task]
+    assert cols.select(recurring_before=datetime.date(2017, 1, 3)) == [
+        task_not_in_collection, incomplete_task]
+    assert cols.select(recurring_before=datetime.date(2017, 1, 4)) == [
+        task_not_in_collection, incomplete_task, weekly_recurring_task]
+
+
+def test_collection_columns(task_collection, incomplete_task,
+                            weekly_recurring_task):
+    day = datetime.date(2017, 6, 1)
+    assert task_collection.overdue(day) == [weekly_recurring_task]
+
+    # changing a task is reflected in the next query
+    incomplete_task.due = '2017-05-01'
+    assert task_collection.overdue(day) == [incomplete_task,
+                                            weekly_recurring_task]
+    weekly_recurring_task.completed = True
+    assert task_collection.overdue(day) == [incomplete_task]
+    task_collection.remove(incomplete_task)
+    assert task_collection.overdue(day) == []
+
+
+def test_load_numpy(task_collection, monkeypatch):
+    monkeypatch.setattr(columns, 'numpy', columns._NOT_LOADED)
+
+    # too few tasks to be worth importing NumPy for
+    assert columns.TaskColumns(task_collection)._numpy is None
+    assert columns.numpy is columns._NOT_LOADED
+
+    numpy = columns.load_numpy(columns.NUMPY_ROWS)
+    assert numpy is not columns._NOT_LOADED
+    assert columns.TaskColumns(task_collection)._numpy is numpy
@@ -0,0 +1,95 @@
+import os
+import socket
+import threading
+
+import pytest
+from click.testing import CliRunner
+
+import completion
+import fast
+import models
+import settings
+import storage
+
+
+@pytest.fixture
+def server(task_collection, tmpdir):
+    path = str(tmpdir.join('tasks.json'))
+    task_collection.save(path)
+
+    server = completion.CompletionServer(str(tmpdir.join('sock')), path)
+    yield server
+    server.server_close()
+
+
+def request(path, line):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.connect(path)
+        s.sendall(line.encode())
+        s.shutdown(socket.SHUT_WR)
+
+        data = b''
+        while True:
+            chunk = s.recv(4096)
+            if not chunk:
+                break
+            data += chunk
+
+    return data.decode()
+
+
+def test_respond(server):
+    assert server.respond('list_commands', []) == fast.COMMANDS
+    assert '-d:Due date of task.' in server.respond('list_options', ['add'])
+    assert server.respond('list_ids', ['complete', '3']) == [
+        '0:incomplete task', '1:completed task']
+    assert server.respond('list_ids', ['add']) == []
+    assert server.respond('dmenu', []) == [
+        '[0] incomplete task', '[3] weekly recurring task']
+
+    # malformed requests get nothing
+    assert server.respond('list_ids', []) == []
+    assert server.respond('no_such_command', []) == []
+
+    # the collection is kept until its files change
+    collection = server.collection
+    assert server.collection is collection
+
+    other = storage.open_collection(server.data_file)
+    other.add(models.Task(name='added elsewhere'))
+    other.save(server.data_file)
+    assert server.collection is not collection
+    assert '[2] added elsewhere' in server.respond('dmenu', [])
+
+
+def test_serve(server, monkeypatch):
+    path = server.server_address
+    monkeypatch.setattr(settings, 'completion_socket', path)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+
+    try:
+        assert completion._socket_in_use(path)
+        assert request(path, 'list_ids\tdelete\t0\n') == \
+            '1:completed task\n3:weekly recurring task\n'
+        assert request(path, 'dmenu\n').splitlines() == [
+            '[0] incomplete task', '[3] weekly recurring task']
+        assert request(path, '\n') == ''
+
+        # a second server is turned away
+        result = CliRunner().invoke(completion.completion, ['serve'])
+        assert result.exit_code == 1
+        assert 'already being served' in result.output
+    finally:
+        server.shutdown()
+        thread.join()
+
+    assert os.stat(path).st_mode & 0o777 == 0o600
+
+    # once the server is gone, a socket left behind is not mistaken for a
+    # running one, so the scripts start Python instead
+    server.server_close()
+    assert os.path.exists(path)
+    assert not completion._socket_in_use(path)
+    os.remove(path)
+    assert not completion._socket_in_use(path)
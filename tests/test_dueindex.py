@@ -0,0 +1,106 @@
+import datetime
+import random
+
+import pytest
+
+import columns
+import dueindex
+import models
+
+
+@pytest.fixture(params=['numpy', 'array'])
+def backend(request, monkeypatch):
+    if request.param == 'numpy':
+        monkeypatch.setattr(columns, 'numpy', pytest.importorskip('numpy'))
+    else:
+        monkeypatch.setattr(columns, 'numpy', None)
+
+    yield request.param
+
+
+def test_due_index(backend, task_collection, incomplete_task, completed_task,
+                   weekly_recurring_task, task_not_in_collection):
+    index = dueindex.DueIndex(columns.TaskColumns(task_collection))
+    assert len(index) == 2
+
+    day = datetime.date(2017, 1, 3).toordinal()
+    assert index.due_by(day - 1) == []
+    assert index.due_by(day) == [weekly_recurring_task]
+    assert index.due_by(day + 365) == [incomplete_task,
+                                       weekly_recurring_task]
+    assert index.next_due(day - 1) == day
+    assert index.next_due(day) == incomplete_task.due_ordinal
+    assert index.next_due(day + 365) is None
+
+    index.add(task_not_in_collection)
+    assert index.select() == [task_not_in_collection, incomplete_task,
+                              weekly_recurring_task]
+    assert index.select(no_recurring=True) == [task_not_in_collection,
+                                               incomplete_task]
+    assert index.select(recurring_before=day) == [task_not_in_collection,
+                                                  incomplete_task]
+    assert index.select(recurring_before=day + 1) == [
+        task_not_in_collection, incomplete_task, weekly_recurring_task]
+
+    # completing tasks takes them out, changed tasks move
+    index.detach(completed_task)
+    completed_task.completed = False
+    index.flush()
+    assert index.select() == [task_not_in_collection, incomplete_task,
+                              completed_task, weekly_recurring_task]
+    index.detach(weekly_recurring_task)
+    weekly_recurring_task.due = '2017-12-01'
+    weekly_recurring_task.due = '2018-01-01'
+    index.detach(weekly_recurring_task)
+    index.detach(incomplete_task)
+    incomplete_task.completed = True
+    index.flush()
+    assert index.select() == [task_not_in_collection, weekly_recurring_task,
+                              completed_task]
+    index.remove(task_not_in_collection)
+    assert len(index) == 2
+
+
+def test_collection_due_index(backend, jan_3_2017):
+    # the index agrees with a scan of every task through any sequence of
+    # adds, postponements, completions and removals
+    rng = random.Random(3)
+    collection = models.TaskCollection()
+
+    def check():
+        cols = columns.TaskColumns(collection)
+        for day in range(0, 60, 7):
+            date = jan_3_2017 + datetime.timedelta(days=day)
+            assert collection.overdue(date) == cols.overdue(date)
+            assert collection.select(recurring_before=date) == \
+                cols.select(recurring_before=date)
+            assert collection.select(no_recurring=True) == \
+                cols.select(no_recurring=True)
+            assert collection.next_due(date) == min(
+                (t.due for t in collection
+                 if t.due and not t.completed and t.due > date),
+                default=None)
+
+    for i in range(200):
+        task = models.Task(name=f'task {i}')
+        if rng.random() < 0.8:
+            task.due = jan_3_2017 + datetime.timedelta(rng.randrange(60))
+        if rng.random() < 0.3:
+            task.recurs = True
+            task.schedule = rng.choice(['1 day', '1 week', '1 month'])
+        collection.add(task)
+        collection.assign_ids()
+
+        if i % 20 == 0:
+            check()
+
+        action = rng.random()
+        task = rng.choice(collection.items)
+        if action < 0.2:
+            task.due = jan_3_2017 + datetime.timedelta(rng.randrange(60))
+        elif action < 0.4 and task.due is not None:
+            task.complete()
+        elif action < 0.5:
+            collection.remove(task)
+
+    check()
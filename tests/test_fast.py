@@ -0,0 +1,87 @@
+import datetime
+import os
+import subprocess
+import sys
+
+import caches
+import completion
+import fast
+import settings
+import storage
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# modules the fast path must get by without
+HEAVY = {'click', 'calendar', 'json', 'tempfile', 'sqlite3', 'numpy',
+         'tasks', 'completion', 'models', 'storage', 'scheduling'}
+
+
+def test_matches_full_cli(tmpdir):
+    assert fast.COMMANDS == completion.command_lines()
+
+    path = str(tmpdir.join('tasks.json'))
+    for backend in storage.backends:
+        assert fast.data_files(path, backend) == \
+            storage.data_files(path, backend)
+
+
+def test_answer(task_collection, tmpdir, monkeypatch):
+    path = str(tmpdir.join('tasks.json'))
+    monkeypatch.setattr(settings, 'data_file', path)
+    monkeypatch.delenv('PYTASKS_PROFILE', raising=False)
+
+    # without caches the full CLI has to run
+    assert fast.answer(['dmenu']) is None
+    assert fast.answer(['list_ids', 'complete']) is None
+    assert fast.answer(['list_commands']) == fast.COMMANDS
+
+    task_collection.save(path)
+    assert fast.answer(['dmenu']) == completion.dmenu_lines(None)
+    assert fast.answer(['list_ids', 'complete', '3']) == \
+        completion.id_lines(None, 'complete', ['3']) == ['0:incomplete task',
+                                                         '1:completed task']
+    assert fast.answer(['list_ids', 'add']) == []
+    assert fast.answer(['status']) == [caches.status_line(
+        task_collection.overdue(datetime.date.today()))]
+
+    # as do other commands and arguments
+    assert fast.answer(['list']) is None
+    assert fast.answer(['status', '--help']) is None
+    assert fast.answer(['list_options', 'add']) is None
+
+
+def test_import_time(task_collection, tmpdir):
+    task_collection.save(str(tmpdir.join('tasks.json')))
+    env = dict(os.environ, XDG_DATA_HOME=str(tmpdir))
+    env.pop('PYTASKS_PROFILE', None)
+
+    for args in [['status'], ['dmenu'], ['list_ids', 'delete'],
+                 ['list_commands']]:
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime',
+             os.path.join(ROOT, 'fast.py')] + args,
+            env=env, capture_output=True, text=True, check=True)
+
+        imported = {line.split('|')[-1].strip().split('.')[0]
+                    for line in result.stderr.splitlines()
+                    if line.startswith('import time:')}
+        assert 'caches' in imported
+        assert imported & HEAVY == set(), args
+
+
+def test_cli_import_time(tmpdir):
+    env = dict(os.environ, XDG_DATA_HOME=str(tmpdir))
+
+    # NumPy is only imported once tasks are filtered
+    for args in [['--help'], ['add', 'new task'], ['status']]:
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime',
+             os.path.join(ROOT, 'tasks.py')] + args,
+            env=env, capture_output=True, text=True, check=True)
+
+        imported = {line.split('|')[-1].strip().split('.')[0]
+                    for line in result.stderr.splitlines()
+                    if line.startswith('import time:')}
+        assert 'click' in imported
+        assert 'numpy' not in imported, args
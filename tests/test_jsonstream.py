@@ -0,0 +1,25 @@
+import io
+import json
+
+import pytest
+
+import jsonstream
+
+
+def test_iter_array():
+    text = json.dumps([{'id': 1, 'name': 'a, "b"'}, [1, 2], 'x]', 2.5, None,
+                       -12345678901234567890, True, {}])
+
+    # elements that straddle chunks are put together again
+    for chunk_size in [1, 2, 3, 7, 1 << 16]:
+        elements = list(jsonstream.iter_array(io.StringIO(text), chunk_size))
+        assert [v for v, _ in elements] == json.loads(text)
+        assert [json.loads(t) for _, t in elements] == json.loads(text)
+
+    assert list(jsonstream.iter_array(io.StringIO(' [ ]\n'))) == []
+    assert list(jsonstream.iter_array(io.StringIO('[ 1 ,2 ]'))) == [
+        (1, '1'), (2, '2')]
+
+    for bad in ['', '{}', '[', '[1', '[1,', '[1,]', '[1 2]']:
+        with pytest.raises(json.JSONDecodeError):
+            list(jsonstream.iter_array(io.StringIO(bad), 2))
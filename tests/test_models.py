@@ -1,5 +1,8 @@
 import datetime
 import json
+
+import pytest
+
 import models
 import settings
 
@@ -136,3 +139,233 @@ def test_task(incomplete_task, weekly_recurring_task):
     weekly_recurring_task.complete()
     assert not weekly_recurring_task.completed
     assert weekly_recurring_task.due == datetime.date(2017, 1, 10)
+
+
+def test_task_collection_ids(task_collection, incomplete_task,
+                             completed_task, task_without_id):
+    # freed ids should be reused, smallest first
+    assert task_collection.find_unused_id() == 2
+    task_collection.remove(completed_task)
+    assert task_collection.find_unused_id() == 1
+    assert task_collection.find_by_id(1) is None
+
+    # changing an id should keep lookups in sync
+    incomplete_task.id = 10
+    assert task_collection.find_by_id(10) is incomplete_task
+    assert task_collection.find_by_id(0) is None
+    assert task_collection.find_unused_id() == 0
+
+    # ids assigned on save should not collide
+    for i in range(5):
+        task_collection.add(models.Task(name=f'new task {i}'))
+    for task in task_collection:
+        if task.id is None:
+            task.id = task_collection.find_unused_id()
+    ids = [t.id for t in task_collection]
+    assert len(ids) == len(set(ids))
+    assert sorted(ids) == [0, 1, 2, 3, 4, 5, 10]
+
+    # reorder resets ids to positions
+    task_collection.reorder()
+    assert [t.id for t in task_collection] == list(range(len(task_collection)))
+    assert task_collection.find_unused_id() == len(task_collection)
+
+    # removing completed tasks frees their ids
+    task_collection[0].completed = True
+    assert task_collection.remove_completed() == 1
+    assert task_collection.find_by_id(0) is None
+    assert task_collection.find_unused_id() == 0
+
+
+def test_task_list_display(task_collection, weekly_recurring_task,
+                           task_without_id):
+    display = models.TaskListDisplay(list(task_collection))
+    display.show_schedule = True
+    lines = list(display.lines())
+
+    assert display.col_widths == {'id': 2, 'task': 21, 'due': 15,
+                                  'schedule': 8}
+    assert lines[0].split() == ['Id', 'Task', 'Due', 'Schedule']
+    assert lines[1] == lines[-2] == '-' * display.total_width
+    assert lines[4].startswith('3   weekly recurring task  Tue Jan 03 2017')
+    assert lines[4].rstrip().endswith('1 week')
+    assert lines[-1] == '3 total tasks'
+    assert display.output() == '\n'.join(lines)
+    assert '\n'.join(display.chunks(size=2)) == display.output()
+
+    # a page of a longer list still reports the full total
+    display = models.TaskListDisplay([weekly_recurring_task])
+    display.total = 10
+    lines = list(display.lines())
+    assert len(lines) == 5
+    assert lines[-1] == '10 total tasks'
+
+    # tasks from several lists are shown with the list they are on
+    display = models.TaskListDisplay(list(task_collection))
+    display.lists = {id(t): 'home' if t.id else 'work'
+                     for t in task_collection}
+    lines = list(display.lines())
+    assert display.col_widths['list'] == 4
+    assert lines[0].split() == ['List', 'Id', 'Task', 'Due']
+    assert lines[2].startswith('work  0 ')
+    assert lines[4].startswith('home  3   weekly recurring task')
+
+    # without any ids (as for archived tasks) the id column is left out
+    display = models.TaskListDisplay([task_without_id])
+    lines = list(display.lines())
+    assert display.col_widths['id'] == 0
+    assert lines[0].startswith('Task ')
+    assert lines[2].startswith('task without id ')
+
+    assert models.TaskListDisplay([]).output() == 'No tasks found.'
+
+
+def test_task_from_record():
+    data = {'id': 5, 'name': 'stored task', 'due': '2017-01-03',
+            'schedule': ''.join(['1 ', 'week']), 'recurs': True,
+            'completed': False}
+    t = models.Task.from_record(data)
+
+    assert t.id == 5
+    assert t.name == 'stored task'
+    assert t.due == datetime.date(2017, 1, 3)
+    assert t.due_ordinal == datetime.date(2017, 1, 3).toordinal()
+    assert t.recurs
+    assert not t.completed
+    assert t.to_json() == dict(data, due=t.due)
+
+    # schedules are shared between tasks
+    assert t.schedule is models.Task(schedule='1 week').schedule
+
+    # tasks have no per-instance __dict__
+    assert not hasattr(t, '__dict__')
+
+    t = models.Task.from_record({'name': 'bare task'})
+    assert t.id is None
+    assert t.due is None
+    assert t.schedule is None
+    assert not t.completed
+    assert not t.recurs
+
+
+def test_stored_dates(monkeypatch):
+    day = datetime.date(2017, 1, 3)
+    encoded = json.dumps(day, cls=models.TaskJSONEncoder)
+    assert encoded == '"2017-01-03"'
+    assert models.Task.from_record({'due': json.loads(encoded)}).due == day
+
+    # dates in other formats, or edited by hand, still load
+    monkeypatch.setattr(settings, 'date_format', '%d/%m/%Y')
+    encoded = json.dumps(day, cls=models.TaskJSONEncoder)
+    assert encoded == '"03/01/2017"'
+    assert models.Task.from_record({'due': json.loads(encoded)}).due == day
+    assert models.Task.from_record({'due': 'tomorrow'}).due == \
+        datetime.date.today() + datetime.timedelta(days=1)
+
+
+def test_load_skipping_completed(task_collection, tmpdir, monkeypatch):
+    # parsing the data file, rather than reading a snapshot of it
+    monkeypatch.setattr(settings, 'snapshot_cache', False)
+    path = str(tmpdir.join('tasks.json'))
+    task_collection.find_by_id(1).name = 'completed, "quoted"'
+    task_collection.save(path)
+    with open(path) as f:
+        stored = json.load(f)[1]
+
+    collection = models.TaskCollection()
+    collection.load(path, keep=models.incomplete)
+    assert [t.id for t in collection] == [0, 3]
+    assert not collection.fully_loaded
+
+    # skipped ids stay taken, and skipped records are saved as they were
+    collection.add(models.Task(name='new'))
+    collection.assign_ids()
+    assert collection[-1].id == 2
+    collection.find_by_id(0).name = 'renamed'
+    collection.save(path)
+    with open(path) as f:
+        saved = json.load(f)
+    assert stored in saved
+    assert [t['id'] for t in saved] == [0, 3, 2, 1]
+
+    # skipped tasks are built when asked for
+    collection = models.TaskCollection()
+    collection.load(path, keep=models.incomplete)
+    assert sorted(collection.names()) == [
+        ('0', 'renamed'), ('1', 'completed, "quoted"'), ('2', 'new'),
+        ('3', 'weekly recurring task')]
+    assert collection.find_by_id(1).completed
+    assert len(collection) == 4
+    assert collection.fully_loaded
+    assert not collection.dirty
+
+    collection = models.TaskCollection()
+    collection.load(path, keep=models.incomplete)
+    assert [t.id for t in collection.select(completed=True)] == [1]
+    assert collection.remove_completed() == 1
+
+
+def test_agenda(task_collection, incomplete_task, weekly_recurring_task):
+    end = datetime.date(2017, 1, 24)
+    assert list(incomplete_task.occurrences(end)) == []
+    assert list(weekly_recurring_task.occurrences(end)) == [
+        datetime.date(2017, 1, d) for d in [3, 10, 17, 24]]
+
+    # the current due date is always included, even if it is in the past
+    start = datetime.date(2017, 1, 15)
+    assert list(weekly_recurring_task.occurrences(end, start)) == [
+        datetime.date(2017, 1, d) for d in [3, 17, 24]]
+
+    task_collection.add(models.Task(id=5, name='other', due='2017-01-10'))
+    agenda = list(task_collection.agenda(end))
+    assert [(d.day, t.id) for d, t in agenda] == [
+        (3, 3), (10, 3), (10, 5), (17, 3), (24, 3)]
+
+    agenda = list(task_collection.agenda(datetime.date(2018, 1, 1), start))
+    assert len(agenda) == 53
+    assert agenda[-1] == (datetime.date(2017, 12, 31), incomplete_task)
+
+
+def test_rollback(task_collection, task_without_id):
+    task_collection.find_by_id(0).name = 'renamed before checkpoint'
+    changes = task_collection.changes()
+    task_collection.checkpoint()
+
+    task_collection.find_by_id(0).complete()
+    task_collection.find_by_id(3).due = '2018-01-01'
+    task_collection.remove(task_collection.find_by_id(3))
+    task_collection.add(task_without_id)
+    task_collection.remove_completed()
+    task_collection.reorder()
+
+    task_collection.rollback()
+    assert [(t.id, t.name, t.completed) for t in task_collection] == [
+        (0, 'renamed before checkpoint', False), (1, 'completed task', True),
+        (3, 'weekly recurring task', False)]
+    assert task_collection.find_by_id(3).due == datetime.date(2017, 1, 3)
+    assert task_without_id._collection is None
+    assert task_collection.changes() == changes
+    assert [t.id for t in task_collection.overdue(
+        datetime.date(2017, 6, 1))] == [3]
+
+
+def test_remove_many(task_collection, task_not_in_collection):
+    first, _, last = task_collection
+    task_collection.checkpoint()
+
+    # tasks are found by identity, so a task that only compares equal to
+    # one in the collection is not removed in its place
+    assert task_collection.remove_many([last, first, last]) == [first, last]
+    assert [t.id for t in task_collection] == [1]
+    assert first._collection is None
+    assert task_collection.find_by_id(0) is None
+
+    task_not_in_collection.id = 1
+    with pytest.raises(ValueError):
+        task_collection.remove(task_not_in_collection)
+    assert [t.id for t in task_collection] == [1]
+
+    # each is put back where it was
+    task_collection.rollback()
+    assert list(task_collection) == [first, task_collection[1], last]
+    assert task_collection.find_by_id(3) is last
@@ -0,0 +1,57 @@
+import json
+import os
+import subprocess
+import sys
+
+import models
+import profiling
+import settings
+
+
+def test_phases(task_collection, tmpdir, monkeypatch):
+    monkeypatch.setattr(settings, 'snapshot_cache', False)
+    path = str(tmpdir.join('tasks.json'))
+    task_collection.save(path)
+
+    # nothing is recorded while profiling is off
+    monkeypatch.setattr(profiling, '_phases', [])
+    models.TaskCollection().load(path)
+    assert profiling._phases == []
+
+    monkeypatch.setattr(profiling, 'enabled', True)
+    collection = models.TaskCollection()
+    collection.load(path)
+    with profiling.phase('render'):
+        models.TaskListDisplay(list(collection)).output()
+
+    phases = [(p['phase'], p['depth']) for p in profiling._phases]
+    assert phases == [('load', 0), ('json.load', 1), ('build tasks', 1),
+                      ('render', 0), ('column widths', 1)]
+    assert all(p['seconds'] >= 0 for p in profiling._phases)
+
+    lines = profiling.summary().splitlines()
+    assert lines[0].startswith('profile: ')
+    assert lines[2].split()[0] == 'json.load'
+
+    # the JSON trace holds the same phases
+    output = str(tmpdir.join('trace.json'))
+    monkeypatch.setattr(profiling, '_output', output)
+    profiling._finish()
+    with open(output) as f:
+        assert json.load(f)['phases'] == profiling._phases
+
+
+def test_import_cost():
+    # while profiling is off, importing it pulls in next to nothing
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env.pop('PYTASKS_PROFILE', None)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import profiling'],
+        cwd=root, env=env, capture_output=True, text=True, check=True)
+
+    imported = {line.split('|')[-1].strip()
+                for line in result.stderr.splitlines()
+                if line.startswith('import time:')}
+    assert 'profiling' in imported
+    assert imported & {'json', 'threading', 'tracemalloc'} == set()
@@ -94,3 +94,73 @@ def test_next_scheduled(jan_3_2017):
     # test failure with invalid schedule
     with pytest.raises(scheduling.SchedulingError):
         scheduling.next_scheduled('foobar', jan_3_2017)
+
+
+def test_schedule(jan_3_2017):
+    """Test the scheduling.Schedule class."""
+
+    # schedules are only parsed once
+    schedule = scheduling.compile_schedule('2 weeks')
+    assert scheduling.compile_schedule('2 weeks') is schedule
+    assert schedule.next_after(jan_3_2017) == datetime.date(2017, 1, 17)
+
+    # months and years roll over into the next year
+    schedule = scheduling.compile_schedule('1 month')
+    assert schedule.next_after(datetime.date(2017, 12, 15)) == \
+        datetime.date(2018, 1, 15)
+    schedule = scheduling.compile_schedule('14 months')
+    assert schedule.next_after(jan_3_2017) == datetime.date(2018, 3, 3)
+
+    # and fall back to the end of shorter months
+    schedule = scheduling.compile_schedule('1 month')
+    assert schedule.next_after(datetime.date(2017, 1, 31)) == \
+        datetime.date(2017, 2, 28)
+    schedule = scheduling.compile_schedule('1 year')
+    assert schedule.next_after(datetime.date(2016, 2, 29)) == \
+        datetime.date(2017, 2, 28)
+
+    # weekday lists are case-insensitive
+    schedule = scheduling.compile_schedule('Monday,friday')
+    assert schedule.next_after(jan_3_2017) == datetime.date(2017, 1, 6)
+    assert schedule.next_after(datetime.date(2017, 1, 6)) == \
+        datetime.date(2017, 1, 9)
+
+    for spec in ['foobar', 'x weeks', 'monday,someday']:
+        with pytest.raises(scheduling.SchedulingError):
+            scheduling.compile_schedule(spec)
+
+
+def test_parse_due_date_day_of_month():
+    """Numeric due dates roll over into the next month that has that day."""
+    dec_20_2017 = datetime.date(2017, 12, 20)
+    result = scheduling.parse_due_date('5', dec_20_2017)
+    assert result == datetime.date(2018, 1, 5)
+
+    jan_31_2017 = datetime.date(2017, 1, 31)
+    result = scheduling.parse_due_date('30', jan_31_2017)
+    assert result == datetime.date(2017, 3, 30)
+
+    with pytest.raises(scheduling.SchedulingError):
+        scheduling.parse_due_date('32', jan_31_2017)
+
+
+def test_schedule_occurrences(jan_3_2017):
+    """Test the scheduling.Schedule.occurrences() generator."""
+    schedule = scheduling.compile_schedule('1 week')
+    dates = list(schedule.occurrences(jan_3_2017, datetime.date(2017, 1, 24)))
+    assert dates == [datetime.date(2017, 1, d) for d in [3, 10, 17, 24]]
+
+    # monthly schedules keep their day of the month
+    schedule = scheduling.compile_schedule('1 month')
+    dates = schedule.occurrences(datetime.date(2017, 1, 31))
+    assert [next(dates) for _ in range(4)] == [
+        datetime.date(2017, 1, 31), datetime.date(2017, 2, 28),
+        datetime.date(2017, 3, 31), datetime.date(2017, 4, 30)]
+
+    schedule = scheduling.compile_schedule('monday,thursday')
+    dates = list(schedule.occurrences(jan_3_2017, datetime.date(2017, 1, 12)))
+    assert dates == [datetime.date(2017, 1, d) for d in [3, 5, 9, 12]]
+
+    # zero-length steps don't repeat forever
+    schedule = scheduling.compile_schedule('0 days')
+    assert list(schedule.occurrences(jan_3_2017)) == [jan_3_2017]
@@ -0,0 +1,46 @@
+import search
+
+
+def test_search_index(task_collection, incomplete_task, completed_task,
+                      weekly_recurring_task, task_not_in_collection):
+    index = search.SearchIndex(task_collection)
+    assert len(index) == 3
+
+    # terms match anywhere in the name, ignoring case
+    assert index.search(['TASK']) == [incomplete_task, completed_task,
+                                      weekly_recurring_task]
+    assert index.search(['omplete']) == [incomplete_task, completed_task]
+    assert index.search(['ly r']) == [weekly_recurring_task]
+    assert index.search(['nope']) == []
+
+    # short terms still work
+    assert index.search(['in']) == [incomplete_task, weekly_recurring_task]
+
+    # each task is returned once, whether any or all terms have to match
+    assert index.search(['weekly', 'recurring']) == [weekly_recurring_task]
+    assert index.search(['incomplete', 'weekly']) == [incomplete_task,
+                                                      weekly_recurring_task]
+    assert index.search(['incomplete', 'weekly'], match_all=True) == []
+    assert index.search(['task', 'complete'], match_all=True) == [
+        incomplete_task, completed_task]
+
+    index.add(task_not_in_collection)
+    index.remove(completed_task)
+    assert index.search(['task']) == [incomplete_task, weekly_recurring_task,
+                                      task_not_in_collection]
+
+
+def test_collection_search(task_collection, incomplete_task,
+                           weekly_recurring_task, task_without_id):
+    assert task_collection.select(search=['task']) == [incomplete_task,
+                                                       weekly_recurring_task]
+
+    # the index follows renames, additions and removals
+    incomplete_task.name = 'renamed'
+    task_collection.add(task_without_id)
+    assert task_collection.select(search=['renamed']) == [incomplete_task]
+    assert task_collection.select(search=['incomplete']) == []
+    assert task_collection.select(search=['without']) == [task_without_id]
+
+    task_collection.remove(task_without_id)
+    assert task_collection.select(search=['without']) == []
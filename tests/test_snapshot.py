@@ -0,0 +1,65 @@
+import json
+import os
+
+import models
+import snapshot
+
+
+def load(path, keep=None):
+    collection = models.TaskCollection()
+    collection.load(path, keep)
+    return collection
+
+
+def test_snapshot(task_collection, tmpdir):
+    path = str(tmpdir.join('tasks.json'))
+    task_collection.save(path)
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    # saving writes a snapshot that loads the same tasks
+    rows, skipped = snapshot.read(path, data)
+    assert rows == [t.to_row() for t in task_collection]
+    assert skipped == []
+    collection = load(path)
+    assert [t.to_json() for t in collection] == \
+        [t.to_json() for t in task_collection]
+    assert not collection.dirty
+
+    # a hand edit that keeps the size and modification time still counts
+    st = os.stat(path)
+    with open(path, 'wb') as f:
+        f.write(data.replace(b'incomplete task', b'INCOMPLETE TASK'))
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert snapshot.read(path, data.upper()) is None
+    assert load(path).find_by_id(0).name == 'INCOMPLETE TASK'
+
+    # which wrote a new snapshot
+    with open(path, 'rb') as f:
+        assert snapshot.read(path, f.read()) is not None
+
+    # a broken snapshot is ignored
+    with open(snapshot.snapshot_path(path), 'wb') as f:
+        f.write(b'not a snapshot')
+    assert load(path).find_by_id(0).name == 'INCOMPLETE TASK'
+
+
+def test_snapshot_skipped(task_collection, tmpdir):
+    path = str(tmpdir.join('tasks.json'))
+    with open(path, 'w') as f:
+        json.dump(list(task_collection), f, cls=models.TaskJSONEncoder)
+
+    # records left out by load stay out when loading from the snapshot
+    collection = load(path, models.incomplete)
+    collection.find_by_id(0).name = 'renamed'
+    collection.save(path)
+    collection = load(path, models.incomplete)
+    assert [t.id for t in collection] == [0, 3]
+    assert collection.find_by_id(1).completed
+
+    # unless every task is wanted
+    collection = load(path)
+    assert sorted(t.id for t in collection) == [0, 1, 3]
+    assert collection.fully_loaded
+    with open(path) as f:
+        assert [t['id'] for t in json.load(f)] == [0, 3, 1]
@@ -0,0 +1,414 @@
+import datetime
+import fcntl
+import glob
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import columns
+import fsutil
+import models
+import recordfile
+import settings
+import storage
+
+
+def test_journal_collection(task_collection, task_without_id, tmpdir):
+    path = str(tmpdir.join('tasks.json'))
+    journal = storage.JournalTaskCollection.journal_path(path)
+
+    # first save has no snapshot to append to, so it writes one
+    collection = storage.JournalTaskCollection()
+    for task in list(task_collection):
+        task_collection.remove(task)
+        collection.add(task)
+    collection.save(path)
+    assert os.path.exists(path)
+    assert not os.path.exists(journal)
+    snapshot = open(path).read()
+
+    # later saves only append the changes
+    collection.add(task_without_id)
+    collection.find_by_id(3).complete()
+    collection.find_by_id(1).name = 'renamed task'
+    collection.remove(collection.find_by_id(0))
+    collection.save(path)
+    assert open(path).read() == snapshot
+    with open(journal) as f:
+        assert len(f.readlines()) == 4
+
+    # loading replays the journal on top of the snapshot
+    loaded = storage.open_collection(path, 'journal')
+    assert len(loaded) == 3
+    assert loaded.find_by_id(0) is not None
+    assert loaded.find_by_id(0).name == 'task without id'
+    assert loaded.find_by_id(1).name == 'renamed task'
+    assert loaded.find_by_id(3).due == datetime.date(2017, 1, 10)
+
+    # replaying a journal that is already in the snapshot changes nothing
+    with open(journal) as f:
+        lines = f.read()
+    loaded.compact(path)
+    assert not os.path.exists(journal)
+    with open(journal, 'w') as f:
+        f.write(lines)
+    reloaded = storage.open_collection(path, 'journal')
+    assert sorted(t.name for t in reloaded) == \
+        sorted(t.name for t in loaded)
+
+    # renumbering tasks forces a compaction
+    reloaded.reorder()
+    reloaded.save(path)
+    assert not os.path.exists(journal)
+
+
+def test_journal_compaction_threshold(tmpdir, monkeypatch):
+    path = str(tmpdir.join('tasks.json'))
+    journal = storage.JournalTaskCollection.journal_path(path)
+    monkeypatch.setattr(settings, 'journal_compact_threshold', 3)
+
+    collection = storage.JournalTaskCollection()
+    collection.save(path)
+
+    for i in range(3):
+        collection.add(models.Task(name=f'task {i}'))
+        collection.save(path)
+    assert os.path.exists(journal)
+
+    collection.add(models.Task(name='one too many'))
+    collection.save(path)
+    assert not os.path.exists(journal)
+    assert len(storage.open_collection(path, 'journal')) == 4
+
+
+def test_concurrent_saves(task_collection, tmpdir):
+    path = str(tmpdir.join('tasks.json'))
+    task_collection.save(path)
+    os.chmod(path, 0o640)
+
+    # a cron job completes a task while the user adds and renames tasks
+    cron = storage.open_collection(path, 'json')
+    user = storage.open_collection(path, 'json')
+    cron.find_by_id(3).complete()
+    cron.add(models.Task(name='from cron'))
+    cron.save(path)
+    user.find_by_id(3).name = 'renamed'
+    user.add(models.Task(name='from user'))
+    user.remove(user.find_by_id(0))
+    user.save(path)
+
+    merged = storage.open_collection(path, 'json')
+    assert sorted(t.name for t in merged) == [
+        'completed task', 'from cron', 'from user', 'renamed']
+    assert merged.find_by_id(3).due == datetime.date(2017, 1, 10)
+    assert user.find_by_id(0).name == 'from user'
+    assert merged.find_by_id(0).name == 'from user'
+    assert os.stat(path).st_mode & 0o777 == 0o640
+
+    # changes to a task removed in the meantime are dropped
+    user = storage.open_collection(path, 'json')
+    cron.find_by_id(2).name = 'gone'
+    user.remove(user.find_by_id(2))
+    user.save(path)
+    cron.save(path)
+    merged = storage.open_collection(path, 'json')
+    assert 'gone' not in [t.name for t in merged]
+    assert len(merged) == 3
+
+
+def test_atomic_write_mode(tmpdir, monkeypatch):
+    # the umask is never touched once there may be threads
+    def umask(mask):
+        raise AssertionError('umask changed')
+    monkeypatch.setattr(os, 'umask', umask)
+
+    path = str(tmpdir.join('new'))
+    fsutil.atomic_write(path, 'data')
+    assert os.stat(path).st_mode & 0o777 == 0o666 & ~fsutil._UMASK
+
+    os.chmod(path, 0o600)
+    fsutil.atomic_write(path, b'data')
+    assert os.stat(path).st_mode & 0o777 == 0o600
+
+
+def test_group_commit(task_collection, tmpdir, monkeypatch):
+    path = str(tmpdir.join('tasks.json'))
+    task_collection.save(path)
+
+    writes = []
+    write = models.TaskCollection._write
+    monkeypatch.setattr(models.TaskCollection, '_write',
+                        lambda self, path: writes.append(path) or
+                        write(self, path))
+
+    writers = [storage.open_collection(path, 'json') for _ in range(3)]
+    for i, collection in enumerate(writers):
+        collection.add(models.Task(name=f'task {i}'))
+
+    # writers that find the lock taken queue their changes and wait
+    with open(f'{path}.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        threads = [threading.Thread(target=c.save, args=(path,))
+                   for c in writers]
+        for thread in threads:
+            thread.start()
+        while len(glob.glob(f'{path}.pending/*.json')) < 3:
+            time.sleep(0.01)
+
+    # then whichever gets the lock first writes for all of them
+    for thread in threads:
+        thread.join()
+    assert len(writes) == 1
+    assert sorted(c[-1].id for c in writers) == [2, 4, 5]
+    assert os.listdir(f'{path}.pending') == []
+
+    merged = storage.open_collection(path, 'json')
+    assert len(merged) == 6
+    for collection in writers:
+        assert merged.find_by_id(collection[-1].id).name == collection[-1].name
+
+    # tickets of writers killed while waiting are dropped, not committed
+    dead = subprocess.run(
+        [sys.executable, '-c', 'import os; print(os.getpid())'],
+        capture_output=True, text=True).stdout.strip()
+    queue = f'{path}.pending'
+    changes = writers[0].changes()
+    changes['added'] = [{'name': 'orphaned task'}]
+    with open(os.path.join(queue, f'{1:020d}-{dead}.json'), 'w') as f:
+        json.dump(changes, f)
+    with open(os.path.join(queue, f'{2:020d}-{dead}.done'), 'w') as f:
+        f.write('[]')
+
+    merged.add(models.Task(name='after orphans'))
+    merged.save(path)
+    assert os.listdir(queue) == []
+    names = [t.name for t in storage.open_collection(path, 'json')]
+    assert 'after orphans' in names
+    assert 'orphaned task' not in names
+
+
+def test_lazy_collection(task_collection, tmpdir):
+    path = str(tmpdir.join('tasks.json'))
+    task_collection.save(path)
+
+    lazy = storage.LazyTaskCollection(path)
+    assert not lazy.loaded
+
+    assert len(lazy) == 3
+    assert lazy.loaded
+    assert lazy.find_by_id(3).name == 'weekly recurring task'
+    assert [t.id for t in lazy] == [0, 1, 3]
+
+    # a missing data file is just an empty collection
+    lazy = storage.LazyTaskCollection(str(tmpdir.join('missing.json')))
+    assert len(lazy) == 0
+
+
+def test_task_lists(task_collection, tmpdir, monkeypatch):
+    monkeypatch.setattr(settings, 'data_file', str(tmpdir.join('tasks.json')))
+
+    assert storage.list_path('default') == settings.data_file
+    assert storage.list_path('work') == str(tmpdir.join('tasks-work.json'))
+    assert storage.list_names('json') == ['default']
+
+    for name in ['work', 'home']:
+        task_collection.save(storage.list_path(name))
+    tmpdir.join('tasks-home.json.snapshot').ensure()
+
+    assert storage.list_names('json') == ['default', 'home', 'work']
+    assert storage.list_names('sqlite') == ['default']
+
+
+def test_sqlite_collection(task_collection, task_without_id, tmpdir):
+    path = str(tmpdir.join('tasks.json'))
+    task_collection.save(path)
+
+    # the database is migrated from the JSON file on first use
+    collection = storage.open_collection(path, 'sqlite')
+    assert os.path.exists(storage.SQLiteTaskCollection.database_path(path))
+    assert collection.find_by_id(3).name == 'weekly recurring task'
+    assert collection.find_by_id('3') is collection.find_by_id(3)
+    assert collection.find_by_id(2) is None
+    assert collection.find_unused_id() == 2
+
+    # queries only build the tasks they return
+    collection = storage.open_collection(path, 'sqlite')
+    overdue = collection.overdue(datetime.date(2017, 6, 1))
+    assert [t.id for t in overdue] == [3]
+    assert len(collection.items) == 1
+
+    selected = collection.select(search=['TASK'])
+    assert [t.id for t in selected] == [0, 3]
+    assert collection.select(search=['weekly', '%']) == [
+        collection.find_by_id(3)]
+    assert collection.select(recurring_before=datetime.date(2017, 1, 1)) \
+        == [collection.find_by_id(0)]
+    assert collection.select(no_recurring=True, completed=True) == [
+        collection.find_by_id(1)]
+
+    collection = storage.open_collection(path, 'sqlite')
+    agenda = collection.agenda(datetime.date(2017, 1, 10))
+    assert [(d.day, t.id) for d, t in agenda] == [(3, 3), (10, 3)]
+
+    # changes are written back row by row
+    collection.find_by_id(3).complete()
+    collection.remove(collection.find_by_id(0))
+    collection.add(task_without_id)
+    collection.save(path)
+    assert task_without_id.id == 0
+
+    reloaded = storage.open_collection(path, 'sqlite')
+    assert len(reloaded) == 3
+    assert reloaded.find_by_id(0).name == 'task without id'
+    assert reloaded.find_by_id(3).due == datetime.date(2017, 1, 10)
+
+    assert reloaded.remove_completed() == 1
+    reloaded.reorder()
+    reloaded.save(path)
+    reloaded = storage.open_collection(path, 'sqlite')
+    assert sorted(t.id for t in reloaded) == [0, 1]
+
+    # tasks added in the same save as a reorder are inserted once, and rows
+    # are not mistaken for the tasks that took their ids
+    reloaded.remove(reloaded.find_by_id(0))
+    reloaded.add(models.Task(name='added before reorder'))
+    reloaded.reorder()
+    assert [t.id for t in reloaded] == [0, 1]
+    reloaded.save(path)
+    reloaded = storage.open_collection(path, 'sqlite')
+    assert {t.id: t.name for t in reloaded} == {
+        0: 'weekly recurring task', 1: 'added before reorder'}
+
+
+@pytest.fixture(params=['numpy', 'array'])
+def fields(request, monkeypatch):
+    if request.param == 'numpy':
+        monkeypatch.setattr(columns, 'numpy', pytest.importorskip('numpy'))
+    else:
+        monkeypatch.setattr(columns, 'numpy', None)
+
+    yield request.param
+
+
+def test_record_collection(fields, task_collection, task_without_id,
+                           tmpdir):
+    path = str(tmpdir.join('tasks.json'))
+    task_collection.save(path)
+    record_path = storage.RecordTaskCollection.record_path(path)
+
+    # the record file is created from the JSON file on first use
+    collection = storage.open_collection(path, 'records')
+    assert os.path.getsize(record_path) == \
+        len(recordfile.MAGIC) + 4 * recordfile.RECORD.size
+    assert collection.find_by_id(3).name == 'weekly recurring task'
+    assert collection.find_by_id('3') is collection.find_by_id(3)
+    assert collection.find_by_id(2) is None
+    assert collection.find_by_id(100) is None
+    assert collection.find_unused_id() == 2
+
+    # queries only build the tasks they return, and select only the ones
+    # that are looked at
+    collection = storage.open_collection(path, 'records')
+    overdue = collection.overdue(datetime.date(2017, 6, 1))
+    assert [t.id for t in overdue] == [3]
+    assert len(collection.items) == 1
+    assert collection.next_due(datetime.date(2017, 6, 1)) == \
+        datetime.date(2017, 12, 31)
+
+    selected = collection.select(search=['TASK'])
+    assert len(selected) == 2
+    assert len(collection.items) == 1
+    assert [t.id for t in selected] == [0, 3]
+    assert collection.select(recurring_before=datetime.date(2017, 1, 1)) \
+        == [collection.find_by_id(0)]
+    assert collection.select(no_recurring=True, completed=True) == [
+        collection.find_by_id(1)]
+
+    # unsaved changes show up in queries
+    collection.find_by_id(0).due = '2017-05-01'
+    assert [t.id for t in collection.overdue(datetime.date(2017, 6, 1))] \
+        == [0, 3]
+
+    # including tasks that have no id yet
+    added = models.Task(name='added task', due='2017-02-01')
+    collection.add(added)
+    assert [t is added for t in collection.select(search=['added'])] == [True]
+    assert collection.select(recurring_before=datetime.date(2017, 1, 1)) \
+        == [collection.find_by_id(0), added]
+
+    # changes are written back record by record, in place
+    collection = storage.open_collection(path, 'records')
+    inode = os.stat(record_path).st_ino
+    collection.find_by_id(3).complete()
+    collection.find_by_id(1).name = 'renamed task'
+    collection.remove(collection.find_by_id(0))
+    collection.add(task_without_id)
+    collection.save(path)
+    assert task_without_id.id == 0
+    assert os.stat(record_path).st_ino == inode
+
+    reloaded = storage.open_collection(path, 'records')
+    assert len(reloaded) == 3
+    assert reloaded.find_by_id(0).name == 'task without id'
+    assert reloaded.find_by_id(1).name == 'renamed task'
+    assert reloaded.find_by_id(3).due == datetime.date(2017, 1, 10)
+    assert reloaded.find_by_id(3).schedule == '1 week'
+
+    # another process's additions are seen when saving
+    other = storage.open_collection(path, 'records')
+    other.add(models.Task(name='from elsewhere'))
+    other.save(path)
+    reloaded.add(models.Task(name='from here'))
+    reloaded.save(path)
+    names = {t.id: t.name for t in storage.open_collection(path, 'records')}
+    assert names[2] == 'from elsewhere'
+    assert names[4] == 'from here'
+
+    assert reloaded.remove_completed() == 1
+    reloaded.reorder()
+    reloaded.save(path)
+    reloaded = storage.open_collection(path, 'records')
+    assert sorted(t.id for t in reloaded) == [0, 1, 2, 3]
+    assert os.path.getsize(record_path) == \
+        len(recordfile.MAGIC) + 4 * recordfile.RECORD.size
+
+    # tasks added in the same save as a reorder are kept
+    reloaded.add(models.Task(name='added before reorder'))
+    reloaded.reorder()
+    reloaded.save(path)
+    names = [t.name for t in storage.open_collection(path, 'records')]
+    assert len(names) == 5
+    assert 'added before reorder' in names
+
+    # and so are tasks added after a reorder, which still need ids
+    reloaded.reorder()
+    reloaded.add(models.Task(name='added after reorder'))
+    reloaded.save(path)
+    names = {t.id: t.name for t in storage.open_collection(path, 'records')}
+    assert names[5] == 'added after reorder'
+    assert sorted(names) == [0, 1, 2, 3, 4, 5]
+
+
+def test_record_collection_from_scratch(fields, tmpdir):
+    path = str(tmpdir.join('tasks.json'))
+
+    # with no data file yet, saving creates the record file while holding
+    # the lock (on a thread, so that deadlocking fails rather than hangs)
+    def first_add():
+        collection = storage.open_collection(path, 'records')
+        collection.add(models.Task(name='first task'))
+        collection.save(path)
+
+    thread = threading.Thread(target=first_add, daemon=True)
+    thread.start()
+    thread.join(10)
+    assert not thread.is_alive()
+
+    reloaded = storage.open_collection(path, 'records')
+    assert [(t.id, t.name) for t in reloaded] == [(0, 'first task')]
+    assert not os.path.exists(path)
@@ -0,0 +1,142 @@
+import json
+
+import pytest
+from click.testing import CliRunner
+
+import models
+import settings
+import storage
+import tasks
+
+
+@pytest.fixture
+def run(tmpdir, monkeypatch):
+    # the CLI, working on a data file in tmpdir
+    path = str(tmpdir.join('tasks.json'))
+    monkeypatch.setattr(settings, 'data_file', path)
+    monkeypatch.setattr(tasks, 'list_name', storage.DEFAULT_LIST)
+    monkeypatch.setattr(tasks, 'data_file', path)
+    monkeypatch.setattr(tasks, 'tasks', storage.LazyTaskCollection(
+        path, keep=models.incomplete))
+
+    def run(args, input=None):
+        return CliRunner().invoke(tasks.cli, args, input=input)
+
+    yield run
+
+
+def saved():
+    return {t.id: t for t in storage.open_collection(tasks.data_file)}
+
+
+def test_batch(run, task_collection):
+    task_collection.save(tasks.data_file)
+
+    # later lines refer to tasks added by earlier ones, and each line is
+    # reported on
+    result = run(['batch'], input='\n'.join([
+        'add "first new task" -d 2001-01-01',
+        json.dumps(['add', 'second new task']),
+        '',
+        'complete 2',
+        'no-such-command',
+    ]))
+    assert result.exit_code == 1
+    assert result.stderr.splitlines()[:3] == [
+        'line 1: ok', 'line 2: ok', 'line 4: ok']
+    assert result.stderr.splitlines()[3].startswith('line 5: failed')
+
+    stored = saved()
+    assert stored[2].name == 'first new task'
+    assert stored[2].completed
+    assert stored[4].name == 'second new task'
+
+
+def test_batch_failures(run, task_collection):
+    task_collection.save(tasks.data_file)
+
+    # a line that fails part way through changes nothing
+    result = run(['batch'], input='complete 0 zz\ndelete 3 zz\nrename 3 x\n')
+    assert result.exit_code == 1
+    assert [line.split(':')[1] for line in result.stderr.splitlines()] == [
+        ' failed', ' failed', ' ok']
+
+    stored = saved()
+    assert not stored[0].completed
+    assert stored[3].name == 'x'
+
+    # with --atomic, nothing is saved if any line fails
+    result = run(['batch', '--atomic'], input='add "new task"\ndelete zz\n')
+    assert result.exit_code == 1
+    assert 'nothing saved' in result.stderr
+    assert len(saved()) == 3
+
+    result = run(['batch'], input='batch\n')
+    assert 'batches cannot be nested' in result.stderr
+
+
+def test_batch_sqlite(run, monkeypatch):
+    monkeypatch.setattr(settings, 'storage_backend', 'sqlite')
+    monkeypatch.setattr(tasks, 'tasks', storage.LazyTaskCollection(
+        tasks.data_file, keep=models.incomplete))
+
+    # queries see the changes made by earlier lines before they are saved
+    result = run(['batch'], input='\n'.join([
+        'add "overdue task" -d 2001-01-01',
+        'list',
+        'status',
+        'complete 0',
+        'status',
+    ]))
+    assert result.exit_code == 0
+    lines = result.stdout.splitlines()
+    assert any('overdue task' in line for line in lines[1:-1])
+    assert lines[-2] == '[0] overdue task'
+    assert lines[-1] == 'Task 0 (overdue task) completed.'
+    assert saved()[0].completed
+
+
+def test_lists(run):
+    for args in [['add', 'default task', '-d', '2001-01-02'],
+                 ['--list', 'work', 'add', 'work task', '-d', '2001-01-03'],
+                 ['-L', 'home', 'add', 'home task', '-d', '2001-01-01'],
+                 ['-L', 'home', 'add', 'undated home task']]:
+        assert run(args).exit_code == 0
+
+    # each list is a data file of its own
+    assert tasks.list_name == 'home'
+    assert tasks.data_file == storage.list_path('home')
+    assert [t.name for t in storage.open_collection(
+        storage.list_path('work'))] == ['work task']
+
+    lines = run(['-L', 'work', 'list']).stdout.splitlines()
+    assert lines[0].split() == ['Id', 'Task', 'Due']
+    assert lines[2].startswith('0   work task')
+
+    # across lists, merged in the order each list is in, with the list
+    # each task is on
+    lines = run(['--all-lists', 'list']).stdout.splitlines()
+    assert lines[0].split() == ['List', 'Id', 'Task', 'Due']
+    assert [line.split()[:2] for line in lines[2:-2]] == [
+        ['home', '1'], ['work', '0'], ['default', '0'], ['home', '0']]
+    assert lines[-1] == '4 total tasks'
+
+    assert run(['--all-lists', 'status']).stdout == \
+        'default: [0] default task home: [0] home task work: [0] work task\n'
+    assert run(['-L', 'default', 'status']).stdout == '[0] default task\n'
+
+    # names have to be usable in file names, and --all-lists only goes
+    # with the commands showing tasks
+    result = run(['-L', 'my/list', 'list'])
+    assert result.exit_code == 2
+    assert 'must be letters, digits, _ and -' in result.output
+    assert run(['--all-lists', 'add', 'task']).exit_code == 2
+    assert run(['--all-lists', '-L', 'work', 'list']).exit_code == 2
+
+    # a batch works on a single list
+    result = run(['-L', 'work', 'batch'],
+                 input='-L work add "another work task"\n-L home list\n')
+    assert result.stderr.splitlines()[0] == 'line 1: ok'
+    assert 'every command in a batch must use the same list' in \
+        result.stderr.splitlines()[1]
+    assert len(saved()) == 2